@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+# action type -> encoder(config) returning one executor sequence step
+ACTION_ENCODERS = {}
+SEQUENCE_CACHE_SIZE = 1024
+
+
+class ActionValidationError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"action {e['index']} ({e['type']}): {e['error']}" for e in errors))
+
+
+def register_action(action_type):
+    """Register an encoder for an action type. New action types only need a decorated function."""
+    def decorator(encoder):
+        ACTION_ENCODERS[action_type] = encoder
+        return encoder
+    return decorator
+
+
+def _float(config, key, default):
+    value = config.get(key, default)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number, got {value!r}")
+
+
+def _int(config, key, default):
+    value = config.get(key, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer, got {value!r}")
+
+
+def _bool(config, key, default):
+    value = config.get(key, default)
+    if isinstance(value, bool):
+        return value
+    # The config panel and older Tasks leave an unset flag as ""
+    if value == "":
+        return False
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError(f"{key} must be true or false, got {value!r}")
+
+
+@register_action("MOVE")
+def _move(config):
+    if config.get("location") in (None, ""):
+        raise ValueError("location is required")
+    return ["Move to indexed location", config.get("location")]
+
+
+@register_action("LATCH")
+def _latch(config):
+    return ["Latch", {}]
+
+
+@register_action("UNLATCH")
+def _unlatch(config):
+    return ["Unlatch", {}]
+
+
+@register_action("REVERSE")
+def _reverse(config):
+    return [
+        "Reverse",
+        config.get("state"),
+        config.get("name"),
+        _float(config, "y_threshold", 0.02),
+        _float(config, "x_threshold", 0),
+        _float(config, "ka_1", -50),
+        _float(config, "ka_2", -50),
+        _float(config, "kc", 0),
+        _float(config, "speed", 10),
+        _float(config, "angle_factor", 1.5),
+        _float(config, "zone", 99),
+        _float(config, "vehicle_latch_distance", -0.7),
+        _float(config, "latch_project_dist", 0.7),
+        _bool(config, "hitch", "True"),
+    ]
+
+
+@register_action("WAIT FOR TRIGGER")
+def _wait_for_trigger(config):
+    return ["Wait for specified trigger", config.get("trigger_id")]
+
+
+@register_action("WAIT")
+def _wait(config):
+    return ["Wait for specified time", _float(config, "wait_time", 0)]
+
+
+@register_action("RELEASE TRIGGER")
+def _release_trigger(config):
+    return ["Release trigger", config.get("wait_id"), config.get("state", False)]
+
+
+@register_action("HORN")
+def _horn(config):
+    return ["Horn", config.get("horn"), _int(config, "repetitions", 1)]
+
+
+@register_action("ANNOUNCE")
+def _announce(config):
+    return ["Voice announcement", config.get("announcement"), _int(config, "repetitions", 1)]
+
+
+@register_action("ROTATE")
+def _rotate(config):
+    return ["Inplace Rotation", _float(config, "steering_angle", 50), _float(config, "target_diff", 180)]
+
+
+def compile_actions(actions):
+    """
+    Translate Task actions into the executor's sequence format.
+    Raises ActionValidationError listing every invalid action.
+    """
+    sequence = []
+    errors = []
+    for index, action in enumerate(actions):
+        action_type = action.get('type')
+        encoder = ACTION_ENCODERS.get(action_type)
+        if encoder is None:
+            errors.append({'index': index, 'type': action_type, 'error': 'unknown action type'})
+            continue
+        try:
+            sequence.append(encoder(action.get('config') or {}))
+        except ValueError as e:
+            errors.append({'index': index, 'type': action_type, 'error': str(e)})
+    if errors:
+        raise ActionValidationError(errors)
+    return sequence
+
+
+class SequenceCache:
+    """
+    LRU of compiled sequences keyed by (Task version id, version).
+    Task versions are immutable snapshots (see task_versions.py), so
+    entries never go stale; they only leave by LRU eviction.
+    """
+
+    def __init__(self, maxsize=SEQUENCE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, task):
+        key = (str(task.id), task.version)
+        with self._lock:
+            sequence = self._entries.get(key)
+            if sequence is not None:
+                self._entries.move_to_end(key)
+                return sequence
+        sequence = compile_actions(task.actions)
+        self.put(task, sequence)
+        return sequence
+
+    def put(self, task, sequence):
+        with self._lock:
+            self._entries[(str(task.id), task.version)] = sequence
+            self._entries.move_to_end((str(task.id), task.version))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+sequence_cache = SequenceCache()
@@ -0,0 +1,197 @@
+"""
+Admission control for task submission.
+
+Every POST /execute-sequence(/batch) asks the controller before it writes
+anything; a refused submission gets 429 with Retry-After instead of
+adding to a backlog the executor cannot work off. Three checks, cheapest
+first:
+
+- a token bucket per client (X-Client-Id, else the remote address):
+  ADMISSION_RATE instances per second with bursts of ADMISSION_BURST;
+- a global limit of ADMISSION_MAX_CONCURRENT submissions being written at
+  once;
+- overload: Queued instances above ADMISSION_QUEUE_HIGH, the dispatch
+  queue more than ADMISSION_DISPATCH_FILL full, or executor calls slower
+  than ADMISSION_DISPATCH_LATENCY seconds. A backlog is shed until the
+  queue is back under ADMISSION_QUEUE_LOW, so the controller does not
+  flap at the threshold. The latency only counts while batches wait for
+  dispatch: nothing is dispatched while submissions are shed, so the
+  average of the last calls must not keep an idle controller overloaded.
+
+Instances already accepted wait in the dispatcher's bounded queue, which
+is the overflow buffer; shedding early keeps it from filling up, so
+accepted work is not marked Failed. The Queued count is read at most
+every ADMISSION_DEPTH_REFRESH_SECONDS (counting stops just past the high
+mark); admissions in between are added to it.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from common import instrumentation
+from dispatcher import DISPATCH_QUEUE_SIZE, dispatcher
+
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', '50'))
+ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', '200'))
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', '32'))
+ADMISSION_QUEUE_HIGH = int(os.environ.get('ADMISSION_QUEUE_HIGH', '20000'))
+ADMISSION_QUEUE_LOW = int(os.environ.get('ADMISSION_QUEUE_LOW', str(int(ADMISSION_QUEUE_HIGH * 0.8))))
+ADMISSION_DISPATCH_FILL = float(os.environ.get('ADMISSION_DISPATCH_FILL', '0.8'))
+ADMISSION_DISPATCH_LATENCY = float(os.environ.get('ADMISSION_DISPATCH_LATENCY', '2'))
+ADMISSION_DEPTH_REFRESH_SECONDS = float(os.environ.get('ADMISSION_DEPTH_REFRESH_SECONDS', '1'))
+# Retry-After for a full concurrency limit, and while overloaded
+ADMISSION_BUSY_RETRY_SECONDS = 1
+ADMISSION_OVERLOAD_RETRY_SECONDS = int(os.environ.get('ADMISSION_OVERLOAD_RETRY_SECONDS', '5'))
+# Idle client buckets are dropped beyond this many
+ADMISSION_MAX_CLIENTS = 10000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Submission rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, cost, now):
+        """Take `cost` tokens; returns 0 on success, else the seconds until they are available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        # A batch larger than the burst goes through on a full bucket and leaves it in debt
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Decides whether a submission of `cost` instances may go ahead; see the
+    module docstring. `depth` returns the Queued count, reading at most
+    `limit` documents.
+    """
+
+    def __init__(self, depth=None, rate=ADMISSION_RATE, burst=ADMISSION_BURST,
+                 max_concurrent=ADMISSION_MAX_CONCURRENT, queue_high=ADMISSION_QUEUE_HIGH,
+                 queue_low=ADMISSION_QUEUE_LOW, enabled=ADMISSION_ENABLED):
+        self.depth = depth
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.enabled = enabled
+        self.in_flight = 0
+        self.overloaded = False
+        self.backlogged = False
+        self.queued = 0
+        self._buckets = OrderedDict()
+        self._depth_read_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def state(self):
+        return {
+            'enabled': self.enabled,
+            'overloaded': self.overloaded,
+            'backlogged': self.backlogged,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'dispatch_queue_batches': dispatcher.queue.qsize(),
+            'dispatch_latency_seconds': round(dispatcher.latency, 4),
+            'clients': len(self._buckets),
+        }
+
+    @contextmanager
+    def admit(self, client, cost=1):
+        """Hold an admission slot while the submission is written; raises AdmissionRejected."""
+        if not self.enabled:
+            yield
+            return
+        self._refresh_depth()
+        now = time.monotonic()
+        with self._lock:
+            reason, retry_after = self._check(client, cost, now)
+            if reason is None:
+                self.in_flight += 1
+                self.queued += cost
+        if reason is not None:
+            instrumentation.metrics.inc('admission_rejected_total', labels={'reason': reason})
+            raise AdmissionRejected(reason, max(1, math.ceil(retry_after)))
+        instrumentation.metrics.inc('admission_admitted_total', cost)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _check(self, client, cost, now):
+        # Called with the lock held; returns (reason, retry after seconds) or (None, 0)
+        if self._is_overloaded():
+            return 'overloaded', ADMISSION_OVERLOAD_RETRY_SECONDS
+        if self.in_flight >= self.max_concurrent:
+            return 'concurrency', ADMISSION_BUSY_RETRY_SECONDS
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            while len(self._buckets) > ADMISSION_MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(cost, now)
+        if wait:
+            return 'rate_limited', wait
+        return None, 0.0
+
+    def _is_overloaded(self):
+        # Only the backlog has hysteresis; the dispatch signals clear as soon as they recover
+        if self.queued > self.queue_high:
+            self.backlogged = True
+        elif self.queued < self.queue_low:
+            self.backlogged = False
+        pending = dispatcher.queue.qsize()
+        dispatch_full = pending >= DISPATCH_QUEUE_SIZE * ADMISSION_DISPATCH_FILL
+        dispatch_slow = dispatcher.latency > ADMISSION_DISPATCH_LATENCY and pending > 0
+        self.overloaded = self.backlogged or dispatch_full or dispatch_slow
+        return self.overloaded
+
+    def _refresh_depth(self):
+        # One request at a time re-reads the Queued count; the rest use the last one
+        now = time.monotonic()
+        with self._lock:
+            if self.depth is None or self._refreshing or (
+                    self._depth_read_at is not None and now - self._depth_read_at < ADMISSION_DEPTH_REFRESH_SECONDS):
+                return
+            self._refreshing = True
+        try:
+            queued = self.depth(self.queue_high + 1)
+            with self._lock:
+                self.queued = queued
+                self._depth_read_at = now
+        except Exception as e:
+            print(f"Error reading queue depth: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+admission = AdmissionController()
+instrumentation.metrics.gauge('admission_in_flight', lambda: admission.in_flight)
+instrumentation.metrics.gauge('admission_queue_depth', lambda: admission.queued)
+instrumentation.metrics.gauge('admission_overloaded', lambda: int(admission.overloaded))
+instrumentation.metrics.gauge('admission_clients', lambda: len(admission._buckets))
+instrumentation.metrics.gauge('dispatch_latency_seconds', lambda: dispatcher.latency)
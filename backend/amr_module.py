@@ -1,143 +1,125 @@
-from flask import jsonify
-import requests
-import json
 from datetime import datetime
-from bson.objectid import ObjectId
 
+from action_compiler import sequence_cache
+from common.execution_log import execution_log
+from executor_client import executor
 
-def execute_task(task_instance_id):
+
+def build_payload(instance, task):
     """
-    Execute a task with the given task instance ID.
-    This function retrieves the task instance from MongoDB,
-    formats the data according to the required API structure,
-    and makes a request to execute the sequence.
+    Build the execute_sequence payload for an already loaded instance and
+    the TaskVersion it runs.
     """
-    try:
-        # Import here to avoid circular imports
-        from app import TaskInstance, Task
-        
-        # Get the task instance from MongoDB
-        instance = TaskInstance.objects.get(id=task_instance_id)
-        task = Task.objects.get(id=instance.task_id)
-        
-        # Build the sequence based on task actions
-        sequence = []
-        for action in task.actions:
-            action_type = action.get('type')
-            config = action.get('config', {})
-            
-            if action_type == "MOVE":
-                sequence.append(["Move to indexed location", config.get("location")])
-            elif action_type == "LATCH":
-                sequence.append(["Latch", {}])
-            elif action_type == "UNLATCH":
-                sequence.append(["Unlatch", {}])
-            elif action_type == "REVERSE":
-                # Extract all necessary parameters from config
-                sequence.append([
-                    "Reverse", 
-                    config.get("state"), 
-                    config.get("name"),
-                    float(config.get("y_threshold", 0.02)),
-                    float(config.get("x_threshold", 0)),
-                    float(config.get("ka_1", -50)),
-                    float(config.get("ka_2", -50)),
-                    float(config.get("kc", 0)),
-                    float(config.get("speed", 10)),
-                    float(config.get("angle_factor", 1.5)),
-                    float(config.get("zone", 99)),
-                    float(config.get("vehicle_latch_distance", -0.7)),
-                    float(config.get("latch_project_dist", 0.7)),
-                    config.get("hitch", "True").lower() == "true"
-                ])
-            elif action_type == "WAIT FOR TRIGGER":
-                sequence.append(["Wait for specified trigger", config.get("trigger_id")])
-            elif action_type == "WAIT":
-                sequence.append(["Wait for specified time", float(config.get("wait_time", 0))])
-            elif action_type == "RELEASE TRIGGER":
-                sequence.append(["Release trigger", config.get("wait_id"), config.get("state", False)])
-            elif action_type == "HORN":
-                sequence.append(["Horn", config.get("horn"), int(config.get("repetitions", 1))])
-            elif action_type == "ANNOUNCE":
-                sequence.append(["Voice announcement", config.get("announcement"), int(config.get("repetitions", 1))])
-            elif action_type == "ROTATE":
-                sequence.append([
-                    "Inplace Rotation", 
-                    float(config.get("steering_angle", 50)), 
-                    float(config.get("target_diff", 180))
-                ])
-                
-        # Prepare the payload
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        payload = {
-            "sequence": sequence,
-            "time_dependant": "0",
-            "time_of_assignment": current_time,
-            "task_instance_id": str(task_instance_id),
-            "task_id": str(task.id),
-            "time_of_creation": current_time,
-            "version": "1",
-            "serial_number": "1",
-            "task_name": task.name
-        }
-        
-        # Make the API request to execute the sequence
-        response = requests.post(
-            "http://localhost:5050/execute_sequence",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload)
-        )
-        
-        # Update the task instance status based on the response
-        if response.status_code == 200:
-            response_data = response.json()
-            instance.status = response_data.get("status", "Queued")
-            instance.save()
-            return True
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "sequence": sequence_cache.get(task),
+        "time_dependant": "0",
+        "time_of_assignment": current_time,
+        "task_instance_id": str(instance.id),
+        "task_id": task.task_id,
+        "time_of_creation": current_time,
+        "version": str(task.version),
+        "serial_number": "1",
+        "task_name": task.name
+    }
+
+
+def execute_tasks(items):
+    """
+    Execute several task instances with a single executor call.
+    `items` is a list of (instance, TaskVersion) pairs that are already loaded.
+    Returns a list of booleans in the same order.
+    """
+    if not items:
+        return []
+    results = [None] * len(items)
+    payloads, positions = [], []
+    for position, (instance, task) in enumerate(items):
+        try:
+            payloads.append(build_payload(instance, task))
+            positions.append(position)
+        except Exception as e:
+            results[position] = {"error": f"Invalid task actions: {str(e)}"}
+
+    if payloads:
+        try:
+            response = executor.post("/execute_sequence_batch", {"sequences": payloads})
+            if response.status_code == 200:
+                sent = response.json().get("results", [])
+            else:
+                sent = [{"error": f"Executor returned {response.status_code}"}] * len(payloads)
+        except Exception as e:
+            print(f"Error executing task batch: {str(e)}")
+            sent = [{"error": str(e)}] * len(payloads)
+        for position, result in zip(positions, sent):
+            results[position] = result
+
+    # Import here to avoid circular imports
+    from app import TaskInstance
+
+    # Record every outcome with one bulk write instead of a save per instance
+    now = datetime.now()
+    updates = {}
+    failed = []
+    outcomes = []
+    for (instance, task), result in zip(items, results):
+        if result is None or "error" in result:
+            error = (result or {}).get("error", "No result from executor")
+            updates[instance.id] = {"dispatch_status": "Failed", "dispatch_error": error, "dispatched_at": now}
+            failed.append(instance.id)
+            execution_log.record("dispatch_failed", instance.id, error=error)
+            outcomes.append(False)
         else:
-            # If the request failed, update the task instance status
-            instance.status = "Failed"
-            instance.save()
-            return False
-            
+            updates[instance.id] = {"dispatch_status": "Dispatched", "dispatch_error": None, "dispatched_at": now}
+            # The executor may already have started a Queued instance, don't move it back
+            if result.get("status", "Queued") != "Queued":
+                updates[instance.id]["status"] = result["status"]
+            execution_log.record("dispatched", instance.id)
+            outcomes.append(True)
+    try:
+        TaskInstance.bulk_update(updates)
+        # The engine claims from Mongo and may already be running an undispatched instance
+        TaskInstance.fail_queued(failed)
     except Exception as e:
-        print(f"Error executing task: {str(e)}")
-        return False
+        print(f"Error recording dispatch outcomes: {str(e)}")
+        return [False] * len(items)
+    return outcomes
 
 
 def get_task_status(task_instance_id):
     """
     Get the detailed status of a task instance.
-    Returns a detailed breakdown of actions and their statuses.
+    Read-only and one indexed query: served from the instance document the
+    execution engine keeps up to date, without a round trip to the engine.
     """
     try:
         # Import here to avoid circular imports
         from app import TaskInstance
         
-        # First check if we have the instance in our database
-        instance = TaskInstance.objects.get(id=task_instance_id)
-        
-        # Make API request to get detailed status from execution engine
-        response = requests.post(
-            "http://localhost:5050/get_task_status",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"task_instance_id": str(task_instance_id)})
-        )
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            # Update our database with the overall status
-            if "sequence_status" in response_data:
-                instance.status = response_data["sequence_status"]
-                instance.save()
-            return response_data
-        else:
-            return {"error": "Failed to get task status", "status_code": response.status_code}
+        task_instance_id = str(task_instance_id)
+        details = TaskInstance.status_details([task_instance_id]).get(task_instance_id)
+        if details is None:
+            return {"error": f"Task instance {task_instance_id} not found"}
+        return details
             
     except Exception as e:
         print(f"Error getting task status: {str(e)}")
         return {"error": str(e)}
 
+def get_etas(task_instance_ids):
+    """
+    Predicted completion of several task instances from the execution
+    engine's travel-time forecast, with one executor call.
+    Returns a dict of task_instance_id -> result, where failed items carry "error".
+    """
+    try:
+        response = executor.post("/eta", {"task_instance_ids": task_instance_ids}, idempotent=True)
+        if response.status_code != 200:
+            return {i: {"error": f"Executor returned {response.status_code}"} for i in task_instance_ids}
+        return response.json().get("results", {})
+    except Exception as e:
+        print(f"Error getting task ETAs: {str(e)}")
+        return {i: {"error": str(e)} for i in task_instance_ids}
 
 def stop_task(task_instance_id):
     """
@@ -152,10 +134,10 @@ def stop_task(task_instance_id):
         instance = TaskInstance.objects.get(id=task_instance_id)
         
         # Make API request to stop the task
-        response = requests.post(
-            "http://localhost:5050/stop_task",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"task_instance_id": str(task_instance_id)})
+        response = executor.post(
+            "/stop_task",
+            {"task_instance_id": str(task_instance_id)},
+            idempotent=True
         )
         
         if response.status_code == 200:
@@ -163,6 +145,7 @@ def stop_task(task_instance_id):
             # Update the task instance status
             instance.status = "Stopped"
             instance.save()
+            execution_log.record("stopped", instance.id)
             return response_data
         else:
             return {"error": "Failed to stop task", "status_code": response.status_code}
@@ -184,10 +167,10 @@ def cancel_task(task_instance_id):
         instance = TaskInstance.objects.get(id=task_instance_id)
         
         # Make API request to cancel the task
-        response = requests.post(
-            "http://localhost:5050/cancel_task",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"task_instance_id": str(task_instance_id)})
+        response = executor.post(
+            "/cancel_task",
+            {"task_instance_id": str(task_instance_id)},
+            idempotent=True
         )
         
         if response.status_code == 200:
@@ -195,6 +178,7 @@ def cancel_task(task_instance_id):
             # Update the task instance status
             instance.status = "Cancelled"
             instance.save()
+            execution_log.record("cancelled", instance.id)
             return response_data
         else:
             return {"error": "Failed to cancel task", "status_code": response.status_code}
@@ -202,3 +186,56 @@ def cancel_task(task_instance_id):
     except Exception as e:
         print(f"Error cancelling task: {str(e)}")
         return {"error": str(e)}
+
+
+def stop_tasks(task_instance_ids):
+    """
+    Stop several task instances with one executor call and one bulk write.
+    Returns a dict of task_instance_id -> result, where failed items carry "error".
+    """
+    return _control_tasks(task_instance_ids, "/stop_task_batch", "Stopped")
+
+
+def cancel_tasks(task_instance_ids):
+    """
+    Cancel several task instances with one executor call and one bulk write.
+    Returns a dict of task_instance_id -> result, where failed items carry "error".
+    """
+    return _control_tasks(task_instance_ids, "/cancel_task_batch", "Cancelled")
+
+
+def _control_tasks(task_instance_ids, path, status):
+    # Import here to avoid circular imports
+    from app import TaskInstance
+
+    results = {}
+    try:
+        known = {str(i.id) for i in TaskInstance.objects(id__in=task_instance_ids).only('id')}
+        for task_instance_id in task_instance_ids:
+            if task_instance_id not in known:
+                results[task_instance_id] = {"error": "Task instance not found"}
+        pending = [i for i in task_instance_ids if i in known]
+        if not pending:
+            return results
+
+        response = executor.post(path, {"task_instance_ids": pending}, idempotent=True)
+        if response.status_code != 200:
+            for task_instance_id in pending:
+                results[task_instance_id] = {"error": f"Executor returned {response.status_code}"}
+            return results
+
+        remote = response.json().get("results", {})
+        updates = {}
+        for task_instance_id in pending:
+            result = remote.get(task_instance_id, {"error": "No result from executor"})
+            results[task_instance_id] = result
+            if "error" not in result:
+                updates[task_instance_id] = {"status": status}
+                execution_log.record(status.lower(), task_instance_id)
+        TaskInstance.bulk_update(updates)
+        return results
+    except Exception as e:
+        print(f"Error controlling tasks: {str(e)}")
+        for task_instance_id in task_instance_ids:
+            results.setdefault(task_instance_id, {"error": str(e)})
+        return results
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReplaceOne
+
+from events import broker
+
+# Terminal instances untouched for this long leave the hot collection
+ARCHIVE_AFTER_HOURS = float(os.environ.get('ARCHIVE_AFTER_HOURS', '24'))
+# Pause between archival passes; 0 turns the archiver off
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '60'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '1000'))
+# Stopped instances can be resumed and keep their AMR, so they stay live
+ARCHIVE_STATUSES = ('Completed', 'Cancelled', 'Failed')
+ARCHIVE_COLLECTION = 'task_instances_archive'
+
+
+def ensure_archive_indexes(db):
+    """Indexes the history endpoint's filters and keyset orders rely on."""
+    archive = db[ARCHIVE_COLLECTION]
+    archive.create_index([('updated_at', ASCENDING), ('_id', ASCENDING)])
+    archive.create_index([('status', ASCENDING), ('updated_at', ASCENDING)])
+    archive.create_index([('task_id', ASCENDING), ('updated_at', ASCENDING)])
+
+
+class Archiver:
+    """
+    Moves terminal task instances older than `age` from task_instances to
+    the archive collection, `batch_size` documents per bulk write, so the
+    hot collection only holds live work and recent history.
+
+    Each batch is upserted into the archive first and then deleted from
+    the hot collection with the same status/age predicate, so an instance
+    that was requeued in between stays live (and its archive copy is
+    dropped). A tombstone per archived instance tells changes-feed clients
+    to drop it from their list. Safe to run in several backend processes.
+    """
+
+    def __init__(self, age=timedelta(hours=ARCHIVE_AFTER_HOURS), interval=ARCHIVE_INTERVAL_SECONDS,
+                 batch_size=ARCHIVE_BATCH_SIZE, statuses=ARCHIVE_STATUSES):
+        self.age = age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.statuses = list(statuses)
+        self.archived = 0
+        self._db = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, db):
+        with self._lock:
+            if self._thread is not None or self.interval <= 0:
+                return
+            self._db = db
+            ensure_archive_indexes(db)
+            self._thread = threading.Thread(target=self._run, name='archiver', daemon=True)
+            self._thread.start()
+
+    def archive_batch(self, db=None):
+        """Archive one batch; returns how many instances left the hot collection."""
+        db = db or self._db
+        hot, archive = db['task_instances'], db[ARCHIVE_COLLECTION]
+        predicate = {'status': {'$in': self.statuses}, 'updated_at': {'$lt': datetime.now() - self.age}}
+        docs = list(hot.find(predicate).sort('updated_at', ASCENDING).limit(self.batch_size))
+        if not docs:
+            return 0
+
+        now = datetime.now()
+        ids = [doc['_id'] for doc in docs]
+        archive.bulk_write([ReplaceOne({'_id': doc['_id']}, dict(doc, archived_at=now), upsert=True)
+                            for doc in docs], ordered=False)
+        deleted = hot.delete_many(dict(predicate, _id={'$in': ids})).deleted_count
+        if deleted < len(ids):
+            # Changed since the read; keep only the live copy
+            kept = {doc['_id'] for doc in hot.find({'_id': {'$in': ids}}, {'_id': 1})}
+            archive.delete_many({'_id': {'$in': list(kept)}})
+            ids = [i for i in ids if i not in kept]
+
+        if ids:
+            db['deleted_task_instances'].insert_many(
+                [{'instance_id': str(i), 'deleted_at': now} for i in ids], ordered=False)
+            for i in ids:
+                broker.publish_local('task_instances', 'delete', i, {})
+        self.archived += len(ids)
+        return len(ids)
+
+    def _run(self):
+        while True:
+            try:
+                # Keep going while batches come back full, then wait for the next pass
+                while self.archive_batch() >= self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Error archiving task instances: {str(e)}")
+            time.sleep(self.interval)
+
+
+archiver = Archiver()
@@ -0,0 +1,86 @@
+import os
+import queue
+import threading
+import time
+
+DISPATCH_WORKERS = int(os.environ.get('DISPATCH_WORKERS', '4'))
+DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', '50'))
+DISPATCH_QUEUE_SIZE = int(os.environ.get('DISPATCH_QUEUE_SIZE', '10000'))
+# Weight of the newest executor call in the smoothed dispatch latency
+LATENCY_SMOOTHING = 0.2
+
+
+class DispatchQueueFull(Exception):
+    pass
+
+
+class Dispatcher:
+    """
+    Hands persisted task instances to the executor off the request thread.
+
+    Requests enqueue (instance, task) pairs that are already loaded; worker
+    threads drain up to `batch_size` of them at a time and submit them with
+    one executor call, recording the outcome on each instance. A wave
+    submitted through submit_many() always goes out as a single call.
+    `latency` is a moving average of how long those calls take.
+    """
+
+    def __init__(self, workers=DISPATCH_WORKERS, batch_size=DISPATCH_BATCH_SIZE, maxsize=DISPATCH_QUEUE_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.latency = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"dispatch-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, instance, task):
+        self.submit_many([(instance, task)])
+
+    def submit_many(self, items):
+        if not items:
+            return
+        self.start()
+        try:
+            self.queue.put_nowait(list(items))
+        except queue.Full:
+            raise DispatchQueueFull("Dispatch queue is full, retry later")
+
+    def _next_batch(self):
+        groups = [self.queue.get()]
+        size = len(groups[0])
+        while size < self.batch_size:
+            try:
+                group = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            groups.append(group)
+            size += len(group)
+        return groups
+
+    def _run(self):
+        # Import here to avoid circular imports
+        from amr_module import execute_tasks
+
+        while True:
+            groups = self._next_batch()
+            started = time.monotonic()
+            try:
+                execute_tasks([item for group in groups for item in group])
+            except Exception as e:
+                print(f"Error dispatching batch: {str(e)}")
+            finally:
+                self.latency += LATENCY_SMOOTHING * (time.monotonic() - started - self.latency)
+                for _ in groups:
+                    self.queue.task_done()
+
+
+dispatcher = Dispatcher()
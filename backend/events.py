@@ -0,0 +1,197 @@
+import json
+import queue
+import threading
+from collections import deque
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Collections whose changes are pushed to subscribers
+WATCHED_COLLECTIONS = ('task_instances', 'amrs')
+# Fields worth pushing; anything else in an update is noise for the dashboard
+WATCHED_FIELDS = ('status', 'current_action_index', 'updated_at', 'task_instance_id', 'name', 'task_id')
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 4096
+KEEPALIVE_SECONDS = 15
+
+
+class Subscriber:
+    def __init__(self, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def offer(self, event):
+        """Queue an event without blocking. A full queue means a slow consumer, which gets dropped."""
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+
+class EventBroker:
+    """
+    Fans out task-instance and AMR changes to any number of subscribers.
+
+    A single upstream watcher feeds the broker: a MongoDB change stream when
+    the server supports it (replica set), otherwise events published in
+    process through publish_local(). Each event gets a broker sequence
+    number; the most recent ones are kept so a reconnecting client can
+    resume from its last seen id instead of reloading everything.
+
+    Sequence numbers, the replay buffer and local-mode fan-out belong to
+    one process, so with WEB_WORKERS > 1 a client has to resume on the
+    worker it was connected to, and local-mode events only reach the
+    clients of the worker that wrote them.
+    """
+
+    def __init__(self, replay_size=REPLAY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._seq = 0
+        self._watcher = None
+        self._stop = threading.Event()
+        self._db = None
+        self.mode = None  # 'change_stream' or 'local' once started
+
+    def start(self, db):
+        """Start the upstream watcher once; later calls are no-ops."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._db = db
+            try:
+                # Opening the stream up front tells us whether change streams are available
+                stream = self._open_stream(None)
+            except OperationFailure:
+                self.mode = 'local'
+                self._watcher = False
+                return
+            self.mode = 'change_stream'
+            self._watcher = threading.Thread(target=self._watch, args=(stream,), daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _open_stream(self, resume_token):
+        pipeline = [
+            {'$match': {
+                'ns.coll': {'$in': list(WATCHED_COLLECTIONS)},
+                'operationType': {'$in': ['insert', 'update', 'replace', 'delete']},
+            }},
+        ]
+        return self._db.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000)
+
+    def _watch(self, stream):
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with stream:
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self.publish(_event_from_change(change))
+            except PyMongoError as e:
+                print(f"Change stream interrupted, resuming: {str(e)}")
+                if self._stop.wait(1):
+                    return
+                try:
+                    stream = self._open_stream(resume_token)
+                except PyMongoError as e:
+                    print(f"Error reopening change stream: {str(e)}")
+
+    def publish_local(self, collection, op, document_id, fields):
+        """In-process publish used by write paths when no change stream is running."""
+        if self.mode != 'local':
+            return
+        self.publish({'collection': collection, 'op': op, 'id': str(document_id), 'fields': fields})
+
+    def publish(self, event):
+        with self._lock:
+            self._seq += 1
+            event = dict(event, seq=self._seq)
+            self._replay.append(event)
+            subscribers = list(self._subscribers)
+        dropped = [subscriber for subscriber in subscribers if not subscriber.offer(event)]
+        if dropped:
+            with self._lock:
+                self._subscribers.difference_update(dropped)
+
+    def subscribe(self, last_seq=None):
+        """
+        Register a subscriber. Returns (subscriber, backlog, reset) where backlog
+        holds the buffered events after last_seq, and reset is True when last_seq
+        has already fallen out of the replay buffer.
+        """
+        subscriber = Subscriber()
+        with self._lock:
+            backlog = []
+            reset = False
+            if last_seq is not None:
+                oldest = self._replay[0]['seq'] if self._replay else self._seq + 1
+                reset = last_seq + 1 < oldest
+                backlog = [event for event in self._replay if event['seq'] > last_seq]
+            self._subscribers.add(subscriber)
+        return subscriber, backlog, reset
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, last_seq=None):
+        """Generator of Server-Sent Events text for one client."""
+        subscriber, backlog, reset = self.subscribe(last_seq)
+        try:
+            if reset:
+                yield format_sse({'reset': True}, event='reset', seq=self._seq)
+            for event in backlog:
+                yield format_sse(event, seq=event['seq'])
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event, seq=event['seq'])
+            # The client reconnects with Last-Event-ID and replays what it missed
+            yield format_sse({'reason': 'slow consumer'}, event='dropped')
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def _event_from_change(change):
+    op = change['operationType']
+    if op == 'update':
+        fields = change.get('updateDescription', {}).get('updatedFields', {})
+    elif op in ('insert', 'replace'):
+        fields = change.get('fullDocument', {})
+    else:
+        fields = {}
+    return {
+        'collection': change['ns']['coll'],
+        'op': op,
+        'id': str(change['documentKey']['_id']),
+        'fields': {key: value for key, value in fields.items() if key in WATCHED_FIELDS},
+    }
+
+
+def format_sse(data, event='change', seq=None):
+    lines = []
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+broker = EventBroker()
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.instrumentation import timed, timer
+
+# Execution engine (simulator) settings, overridable per deployment
+EXECUTOR_URL = os.environ.get('EXECUTOR_URL', 'http://localhost:5050')
+EXECUTOR_POOL_SIZE = int(os.environ.get('EXECUTOR_POOL_SIZE', '20'))
+EXECUTOR_CONNECT_TIMEOUT = float(os.environ.get('EXECUTOR_CONNECT_TIMEOUT', '2'))
+EXECUTOR_READ_TIMEOUT = float(os.environ.get('EXECUTOR_READ_TIMEOUT', '5'))
+EXECUTOR_RETRIES = int(os.environ.get('EXECUTOR_RETRIES', '2'))
+EXECUTOR_BACKOFF = float(os.environ.get('EXECUTOR_BACKOFF', '0.1'))
+EXECUTOR_BREAKER_THRESHOLD = int(os.environ.get('EXECUTOR_BREAKER_THRESHOLD', '5'))
+EXECUTOR_BREAKER_RESET = float(os.environ.get('EXECUTOR_BREAKER_RESET', '30'))
+
+
+class ExecutorUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling the executor after `threshold` consecutive failures.
+    After `reset_timeout` seconds one trial call is let through; its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=EXECUTOR_BREAKER_THRESHOLD, reset_timeout=EXECUTOR_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class ExecutorClient:
+    """
+    Shared HTTP client for backend -> execution engine calls.
+
+    Keeps a pool of keep-alive connections, applies connect/read timeouts to
+    every call, retries idempotent calls with exponential backoff, and trips
+    a circuit breaker so a stalled executor fails fast instead of holding
+    request threads.
+    """
+
+    def __init__(self, base_url=EXECUTOR_URL, pool_size=EXECUTOR_POOL_SIZE,
+                 connect_timeout=EXECUTOR_CONNECT_TIMEOUT, read_timeout=EXECUTOR_READ_TIMEOUT,
+                 retries=EXECUTOR_RETRIES, backoff=EXECUTOR_BACKOFF, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        # pool_block keeps the socket count at pool_size under bursts instead of opening throwaway connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, path, payload, idempotent=False):
+        """POST `payload` as JSON to `path` and return the response."""
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise ExecutorUnavailable(f"Executor circuit open, skipping {path}")
+            try:
+                with timed('http'), timer('executor_request_duration_seconds', {'path': path}):
+                    response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+            except requests.RequestException:
+                self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    return response
+            time.sleep(self.backoff * (2 ** attempt))
+
+    def close(self):
+        self.session.close()
+
+
+executor = ExecutorClient()
@@ -0,0 +1,18 @@
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+# gevent workers make the blocking pymongo and executor calls cooperative, so one worker keeps
+# thousands of requests (status polls, SSE streams) open on a single OS thread.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# One worker unless WEB_WORKERS says otherwise: the SSE broker (sequence numbers, replay buffer,
+# local-mode fan-out), startup recovery of pending dispatches and the background threads (dispatcher,
+# execution log, archiver) are per process. More workers split /events resumes (and, without a change
+# stream, the events themselves) and re-dispatch pending instances once per worker; startup() warns.
+workers = int(os.environ.get('WEB_WORKERS', '1'))
+# gthread (with WEB_THREADS) when the slow-request profiler is on: it samples OS threads, not greenlets
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', '2000'))
+threads = int(os.environ.get('WEB_THREADS', '8'))
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from mongoengine.queryset.visitor import Q
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SORT_FIELDS = ('id', 'updated_at')
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_fields(raw, allowed):
+    """
+    Parse a comma separated `fields=` argument into a tuple of field names.
+    Returns None when the argument is absent so callers fall back to the full shape.
+    """
+    if not raw:
+        return None
+    fields = tuple(f.strip() for f in raw.split(',') if f.strip())
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(raw):
+    if raw is None:
+        return None
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_timestamp(raw, name):
+    """
+    Parse an ISO 8601 argument into the naive local time the documents are
+    stamped with. A UTC offset (or Z) is converted to local time first.
+    Returns None when the argument is absent.
+    """
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw[:-1] + '+00:00' if raw.endswith('Z') else raw)
+    except ValueError:
+        raise PaginationError(f"{name} must be an ISO timestamp")
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _value(document, field):
+    # Documents or raw as_pymongo() dicts
+    if isinstance(document, dict):
+        return document.get('_id' if field == 'id' else field)
+    return getattr(document, field)
+
+
+def encode_cursor(document, sort):
+    if sort == 'updated_at':
+        updated_at = _value(document, 'updated_at')
+        return f"{updated_at.isoformat() if updated_at else ''}_{_value(document, 'id')}"
+    return str(_value(document, 'id'))
+
+
+def _decode_cursor(cursor, sort):
+    try:
+        if sort == 'updated_at':
+            updated_at, _, oid = cursor.rpartition('_')
+            return (datetime.fromisoformat(updated_at) if updated_at else None), ObjectId(oid)
+        return None, ObjectId(cursor)
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def paginate(queryset, limit=None, after=None, sort='id'):
+    """
+    Keyset pagination over `queryset` ordered by `sort` with `_id` as tie breaker.
+
+    Returns (documents, next_cursor). next_cursor is None on the last page.
+    With neither limit nor after the whole (ordered) result is returned, which
+    keeps existing clients that expect a single array working; it comes back
+    as the unevaluated queryset, so callers can stream it.
+    """
+    if sort not in SORT_FIELDS:
+        raise PaginationError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+
+    if after:
+        updated_at, oid = _decode_cursor(after, sort)
+        if sort == 'updated_at':
+            # Missing updated_at sorts first, so a null cursor still has every dated row ahead of it
+            if updated_at is None:
+                queryset = queryset.filter(Q(updated_at=None, id__gt=oid) | Q(updated_at__ne=None))
+            else:
+                queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=oid))
+        else:
+            queryset = queryset.filter(id__gt=oid)
+
+    queryset = queryset.order_by('updated_at', 'id') if sort == 'updated_at' else queryset.order_by('id')
+
+    if limit is None and not after:
+        return queryset, None
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    # Fetch one extra row to learn whether another page exists without a count()
+    documents = list(queryset.limit(limit + 1))
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, encode_cursor(documents[-1], sort)
+    return documents, None
@@ -0,0 +1,108 @@
+"""
+Fast JSON encoding and streamed listing responses.
+
+Every response is encoded with orjson (datetimes as ISO 8601, ObjectIds
+as strings) through OrjsonProvider. Large listings are read raw with
+as_pymongo(), serialized STREAM_CHUNK_SIZE items at a time and written as
+the cursor yields them, so peak memory follows the chunk size rather than
+the result size. Listings are compressed with br or gzip when the client
+accepts it; br needs the optional Brotli package.
+"""
+import os
+import zlib
+
+import orjson
+from bson.objectid import ObjectId
+from flask import Response, request, stream_with_context
+from flask.json.provider import JSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Documents fetched, serialized and written per chunk
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '500'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify() and request.get_json()."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def batched(cursor, size=STREAM_CHUNK_SIZE):
+    """Lists of up to `size` documents, fetching each from Mongo only when it is needed."""
+    if hasattr(cursor, 'batch_size'):
+        cursor = cursor.batch_size(size)
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return 'br', compressor.process, compressor.finish
+    if accepted['gzip']:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return 'gzip', compressor.compress, compressor.flush
+    return None, None, None
+
+
+def _compressed(chunks, compress, finish):
+    for chunk in chunks:
+        out = compress(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def stream_listing(key, batches, trailer=None):
+    """
+    Stream {"success": true, key: [...], **trailer()} with the items of
+    each serialized batch written as soon as it is ready. `trailer` runs
+    after the last batch, so it can report state such as the next cursor.
+    """
+    encoding, compress, finish = _negotiate()
+
+    def body():
+        yield b'{"success":true,' + dumps(key) + b':['
+        first = True
+        for batch in batches:
+            if not batch:
+                continue
+            chunk = b','.join(dumps(item) for item in batch)
+            yield chunk if first else b',' + chunk
+            first = False
+        tail = dumps(trailer() if trailer else {})
+        yield b']' + (b',' + tail[1:] if len(tail) > 2 else b'}')
+
+    chunks = body() if encoding is None else _compressed(body(), compress, finish)
+    response = Response(stream_with_context(chunks), mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
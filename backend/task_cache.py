@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+# Upper bound on the BSON size of all cached Task documents
+TASK_CACHE_BYTES = int(os.environ.get('TASK_CACHE_BYTES', str(32 * 1024 * 1024)))
+# How often a worker checks for Task writes made by other workers; 0 turns the shared check off
+TASK_CACHE_CHECK_SECONDS = float(os.environ.get('TASK_CACHE_CHECK_SECONDS', '1'))
+# Document in cache_versions whose counter is bumped on every Task update or delete
+COUNTER_ID = 'tasks'
+
+
+class TaskCache:
+    """
+    Read-through LRU of Task documents keyed by id, capped by BSON size.
+
+    Task.save() and Task.delete() invalidate the local entry and bump a
+    counter in Mongo. Other workers read that counter at most every
+    `check_interval` seconds and drop everything they hold when it moved.
+    Immutable documents (Task versions) use check_interval=0 and are never
+    invalidated. Cached documents are shared between threads and must not
+    be modified. `id_check` filters out ids that cannot exist before querying.
+    """
+
+    def __init__(self, document, max_bytes=TASK_CACHE_BYTES, check_interval=TASK_CACHE_CHECK_SECONDS,
+                 id_check=ObjectId.is_valid):
+        self.document = document
+        self.id_check = id_check
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # task id -> (task, size)
+        self._bytes = 0
+        # Bumped by every invalidation so a load that raced with one is not cached
+        self._epoch = 0
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _counters(self):
+        return self.document._get_db()['cache_versions']
+
+    def _check_generation(self):
+        if self.check_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        doc = self._counters().find_one({'_id': COUNTER_ID})
+        generation = doc['version'] if doc else 0
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                self._clear_locked()
+            self._generation = generation
+
+    def get(self, task_id):
+        task = self.get_many([task_id]).get(str(task_id))
+        if task is None:
+            raise self.document.DoesNotExist(f"Task {task_id} not found")
+        return task
+
+    def get_many(self, task_ids):
+        """{task id: Task} for the ids that exist; misses are loaded with one $in query."""
+        self._check_generation()
+        found, missing = {}, []
+        with self._lock:
+            for task_id in {str(task_id) for task_id in task_ids}:
+                entry = self._entries.get(task_id)
+                if entry is None:
+                    missing.append(task_id)
+                    continue
+                self._entries.move_to_end(task_id)
+                found[task_id] = entry[0]
+            self.hits += len(found)
+            self.misses += len(missing)
+            epoch = self._epoch
+        valid = [task_id for task_id in missing if self.id_check is None or self.id_check(task_id)]
+        if valid:
+            for task in self.document.objects(id__in=valid):
+                found[str(task.id)] = task
+                self._put(task, epoch)
+        return found
+
+    def put(self, task):
+        with self._lock:
+            epoch = self._epoch
+        self._put(task, epoch)
+
+    def _put(self, task, epoch):
+        size = len(bson.encode(task.to_mongo()))
+        task_id = str(task.id)
+        with self._lock:
+            if epoch != self._epoch or size > self.max_bytes:
+                return
+            self._remove_locked(task_id)
+            self._entries[task_id] = (task, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, task_id, shared=True):
+        """Drop a Task after it was written; with `shared` other workers are told too."""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            self._remove_locked(str(task_id))
+            expected = self._generation
+        if not shared or self.check_interval <= 0:
+            return
+        doc = self._counters().find_one_and_update(
+            {'_id': COUNTER_ID}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        with self._lock:
+            # Skip our own bump; if someone else bumped in between the next check clears everything
+            if expected is not None and doc['version'] == expected + 1:
+                self._generation = doc['version']
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def _remove_locked(self, task_id):
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _clear_locked(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,5 @@
+# Production entry point (see gunicorn.conf.py). Every worker recovers on the existing data before
+# it serves.
+from app import app, startup
+
+startup()
@@ -0,0 +1,57 @@
+"""
+Sequence construction throughput for large action lists.
+
+Compares compiling a Task's actions on every dispatch (what execute_task
+used to do) with fetching the compiled sequence from the SequenceCache.
+
+Usage:
+    python bench/bench_action_compiler.py --sizes 10,100,1000,10000
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from action_compiler import SequenceCache, compile_actions
+
+TEMPLATES = [
+    {'type': 'MOVE', 'config': {'location': '12'}},
+    {'type': 'REVERSE', 'config': {'state': 'on', 'name': 'dock', 'speed': '8', 'hitch': 'False'}},
+    {'type': 'WAIT', 'config': {'wait_time': '5'}},
+    {'type': 'ROTATE', 'config': {'steering_angle': '45', 'target_diff': '90'}},
+    {'type': 'HORN', 'config': {'horn': 'short', 'repetitions': '2'}},
+    {'type': 'LATCH', 'config': {}},
+]
+
+
+def rate(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--dispatches', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'actions':>8} {'compile/s':>12} {'cached/s':>12} {'actions/s compiled':>20}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        actions = [TEMPLATES[i % len(TEMPLATES)] for i in range(size)]
+        task = SimpleNamespace(id=ObjectId(), version=1, actions=actions)
+        cache = SequenceCache()
+        cache.get(task)  # compiled once, as on Task save
+        compiled = rate(lambda: compile_actions(actions), args.dispatches)
+        cached = rate(lambda: cache.get(task), args.dispatches)
+        print(f"{size:>8} {compiled:>12.0f} {cached:>12.0f} {compiled * size:>20.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Makespan and utilization of the simulator's assignment policies.
+
+Runs an offline, tick-based simulation (no Mongo) of a fleet working
+through a backlog of pickup/dropoff tasks. Travel time is distance over
+speed on a random layout of indexed locations; each tick the policy pairs
+idle AMRs with queued tasks the same way the engine does.
+
+Usage:
+    python bench/bench_assignment.py --amrs 50 --tasks 2000 --locations 200
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'simulator'))
+
+from assignment import LocationIndex, NearestRobotPolicy, move_locations
+
+
+class SimAMR:
+    def __init__(self, name, location):
+        self.name = name
+        self.location = location
+        self.free_at = 0.0
+        self.busy = 0.0
+        self.empty_travel = 0.0
+
+
+def queue_order(idle, queued, key):
+    ordered = sorted(queued, key=key)
+    return list(zip(idle, ordered))
+
+
+def simulate(policy, amrs, tasks, locations, speed, work_seconds, tick):
+    queued = list(tasks)
+    now = 0.0
+    nearest = NearestRobotPolicy(locations)
+    while queued:
+        idle = [amr for amr in amrs if amr.free_at <= now]
+        if idle:
+            if policy == 'fifo':
+                pairs = queue_order(idle, queued, key=lambda t: t['created_at'])
+            elif policy == 'priority':
+                pairs = queue_order(idle, queued, key=lambda t: (-t['priority'], t['created_at']))
+            else:
+                window = sorted(queued, key=lambda t: (-t['priority'], t['created_at']))[:4 * len(idle)]
+                pairs = nearest.match(idle, window)
+            for amr, task in pairs:
+                queued.remove(task)
+                pickup, dropoff = move_locations(task['actions'])
+                empty = locations.distance(amr.location, pickup) / speed
+                loaded = locations.distance(pickup, dropoff) / speed
+                duration = empty + loaded + work_seconds
+                amr.empty_travel += empty
+                amr.busy += loaded + work_seconds
+                amr.free_at = now + duration
+                amr.location = dropoff
+        now += tick
+    makespan = max(amr.free_at for amr in amrs)
+    utilization = sum(amr.busy for amr in amrs) / (len(amrs) * makespan)
+    return makespan, utilization, sum(amr.empty_travel for amr in amrs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--amrs', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--locations', type=int, default=200)
+    parser.add_argument('--speed', type=float, default=1.0, help='distance units per second')
+    parser.add_argument('--work-seconds', type=float, default=10.0)
+    parser.add_argument('--tick', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    coordinates = {str(i): [rng.uniform(0, 100), rng.uniform(0, 100)] for i in range(args.locations)}
+    locations = LocationIndex(coordinates)
+    tasks = [
+        {
+            'created_at': i,
+            'priority': rng.choice([0, 0, 0, 1]),
+            'actions': [
+                {'type': 'MOVE', 'config': {'location': str(rng.randrange(args.locations))}},
+                {'type': 'LATCH', 'config': {}},
+                {'type': 'MOVE', 'config': {'location': str(rng.randrange(args.locations))}},
+            ],
+        }
+        for i in range(args.tasks)
+    ]
+    starts = [str(rng.randrange(args.locations)) for _ in range(args.amrs)]
+
+    print(f"{'policy':<10} {'makespan s':>11} {'utilization':>12} {'empty travel s':>15}")
+    for policy in ('fifo', 'priority', 'nearest'):
+        amrs = [SimAMR(f'AMR-{i:03d}', starts[i]) for i in range(args.amrs)]
+        makespan, utilization, empty = simulate(policy, amrs, tasks, locations, args.speed,
+                                                args.work_seconds, args.tick)
+        print(f"{policy:<10} {makespan:>11.0f} {utilization:>12.1%} {empty:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Concurrency stress test for atomic task claiming.
+
+Seeds N Queued instances, then lets W worker processes race to claim them
+with the simulator's claim_next() until the queue is empty. Reports claim
+throughput per worker count and fails loudly on any double assignment.
+
+Needs a real mongod (findOneAndUpdate atomicity is what is being tested):
+    python bench/bench_claims.py --mongo-uri mongodb://localhost:27017 --instances 5000 --workers 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'simulator'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engine import claim_next, ensure_indexes
+
+DB_NAME = 'amr-bench-claims'
+
+
+def worker(args):
+    mongo_uri, worker_id = args
+    collection = MongoClient(mongo_uri)[DB_NAME]['task_instances']
+    claimed = []
+    while True:
+        doc = claim_next(collection, f'AMR-{worker_id}', worker_id)
+        if doc is None:
+            return claimed
+        claimed.append(str(doc['_id']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--instances', type=int, default=5000)
+    parser.add_argument('--workers', default='1,2,4,8')
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[DB_NAME]
+    ensure_indexes(db)
+    print(f"{'workers':>8} {'claims':>8} {'claims/s':>10} {'double':>8}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        db['task_instances'].delete_many({})
+        base = datetime.now()
+        db['task_instances'].insert_many([
+            {'status': 'Queued', 'priority': i % 3, 'created_at': base + timedelta(microseconds=i), 'actions': []}
+            for i in range(args.instances)
+        ])
+        start = time.perf_counter()
+        with Pool(workers) as pool:
+            results = pool.map(worker, [(args.mongo_uri, w) for w in range(workers)])
+        elapsed = time.perf_counter() - start
+        counts = Counter(i for claimed in results for i in claimed)
+        doubles = sum(1 for c in counts.values() if c > 1)
+        total = sum(counts.values())
+        print(f"{workers:>8} {total:>8} {total / elapsed:>10.0f} {doubles:>8}")
+        if doubles or len(counts) != args.instances:
+            raise SystemExit(f"claimed {len(counts)} distinct of {args.instances}, {doubles} claimed twice")
+    db.client.drop_database(DB_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Travel-time matrix and queue forecast timings (no Mongo).
+
+Builds the all-pairs matrix for a grid map of indexed locations, then
+times single edge updates (faster, slower, removed) against rebuilding
+the matrix, and forecasts for queues of increasing length against a
+fleet, comparing the plan-per-Task-version forecast with estimating
+every instance action by action.
+
+Usage:
+    python bench/bench_eta.py --locations 400 --amrs 50 --queues 1000,5000,20000
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'simulator'))
+
+from assignment import move_locations
+from travel import TravelTimes, action_durations, forecast
+
+
+def grid_edges(locations, rng):
+    side = max(2, int(locations ** 0.5))
+    edges = []
+    for i in range(side * side):
+        if (i + 1) % side:
+            edges.append([str(i), str(i + 1), rng.uniform(5, 30)])
+        if i + side < side * side:
+            edges.append([str(i), str(i + side), rng.uniform(5, 30)])
+    return edges
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+def make_queue(size, tasks, nodes, rng):
+    definitions = []
+    for t in range(tasks):
+        pickup, dropoff = rng.sample(nodes, 2)
+        definitions.append(('task-%d' % t, 1, [
+            {'type': 'MOVE', 'config': {'location': pickup}},
+            {'type': 'REVERSE', 'config': {}},
+            {'type': 'WAIT', 'config': {'wait_time': rng.randint(5, 60)}},
+            {'type': 'MOVE', 'config': {'location': dropoff}},
+            {'type': 'ROTATE', 'config': {'target_diff': 180}},
+        ]))
+    return [{'_id': 'i%d' % i, 'task_id': task_id, 'task_version': version, 'actions': actions}
+            for i, (task_id, version, actions) in enumerate(rng.choice(definitions) for _ in range(size))]
+
+
+def naive_forecast(available, queued, travel):
+    """Every instance estimated action by action from the AMR's location."""
+    heap = list(available)
+    heapq.heapify(heap)
+    etas = {}
+    for doc in queued:
+        free_at, name, location = heap[0]
+        done = free_at + sum(action_durations(doc['actions'], location, travel))
+        etas[doc['_id']] = done
+        locations = move_locations(doc['actions'])
+        heapq.heapreplace(heap, (done, name, locations[-1] if locations else location))
+    return etas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--locations', type=int, default=400)
+    parser.add_argument('--amrs', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=200, help='distinct Task versions in the queue')
+    parser.add_argument('--queues', default='1000,5000,20000')
+    parser.add_argument('--updates', type=int, default=20, help='edge updates timed per kind')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    edges = grid_edges(args.locations, rng)
+    travel, build_ms = timed(TravelTimes, edges)
+    report = {'locations': len(travel.nodes), 'edges': len(edges), 'build_ms': build_ms, 'updates': {}, 'forecasts': []}
+    print(f"matrix: {len(travel.nodes)} locations, {len(edges)} edges, built in {build_ms} ms")
+
+    for kind in ('faster', 'slower', 'removed'):
+        times, rows = [], []
+        for a, b, seconds in rng.sample(edges, args.updates):
+            new = {'faster': seconds / 2, 'slower': seconds * 2, 'removed': None}[kind]
+            recomputed, ms = timed(travel.set_edge, a, b, new)
+            times.append(ms)
+            rows.append(recomputed)
+            travel.set_edge(a, b, seconds)
+        report['updates'][kind] = {'mean_ms': round(sum(times) / len(times), 2),
+                                   'max_ms': max(times), 'mean_rows_recomputed': sum(rows) / len(rows)}
+        print(f"edge {kind:<8} mean {report['updates'][kind]['mean_ms']:>8} ms  max {max(times):>8} ms  "
+              f"rows recomputed {report['updates'][kind]['mean_rows_recomputed']:.1f} (full rebuild {build_ms} ms)")
+
+    available = [(rng.uniform(0, 120), 'AMR-%03d' % n, rng.choice(travel.nodes)) for n in range(args.amrs)]
+    print(f"\n{'queued':>7} {'forecast ms':>12} {'naive ms':>9} {'makespan s':>11}")
+    for size in [int(s) for s in args.queues.split(',')]:
+        queued = make_queue(size, args.tasks, travel.nodes, rng)
+        etas, ms = timed(forecast, available, queued, travel)
+        naive, naive_ms = timed(naive_forecast, available, queued, travel)
+        assert all(abs(etas[k] - naive[k]) < 1e-6 for k in etas)
+        result = {'queued': size, 'forecast_ms': ms, 'naive_ms': naive_ms, 'makespan_seconds': round(max(etas.values()), 1)}
+        report['forecasts'].append(result)
+        print(f"{size:>7} {ms:>12} {naive_ms:>9} {result['makespan_seconds']:>11}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-call latency and connection count for backend -> executor calls.
+
+Starts a keep-alive stub of the simulator on a free local port and calls
+it N times from T threads, first with bare requests.post (the old path)
+and then through the pooled ExecutorClient. The stub counts the TCP
+connections it accepts.
+
+Usage:
+    python bench/bench_executor_client.py --calls 2000 --threads 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from executor_client import ExecutorClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'status': 'Queued'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, call, calls, threads):
+    StubHandler.connections = 0
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:<16} {statistics.median(latencies):>8.2f} {latencies[int(len(latencies) * 0.99) - 1]:>8.2f} "
+          f"{calls / elapsed:>9.0f} {StubHandler.connections:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    payload = {'task_instance_id': '0' * 24}
+
+    print(f"{'client':<16} {'p50 ms':>8} {'p99 ms':>8} {'calls/s':>9} {'connections':>12}")
+    run('requests.post', lambda: requests.post(url + '/get_task_status', headers={'Content-Type': 'application/json'},
+                                               data=json.dumps(payload)), args.calls, args.threads)
+    client = ExecutorClient(base_url=url, pool_size=args.threads)
+    run('ExecutorClient', lambda: client.post('/get_task_status', payload, idempotent=True), args.calls, args.threads)
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Simulator startup time against a growing history.
+
+Seeds a fleet with some of its AMRs mid-task plus N terminal instances and a
+few orphaned claims, then times ensure_indexes() and ExecutionEngine.load()
+(the recovery path run before the simulator serves traffic). Startup should
+depend on the fleet and the live work, not on the size of the history.
+
+Needs a real mongod:
+    python bench/bench_startup.py --mongo-uri mongodb://localhost:27017 --history 0,100000,1000000 --fleet 500
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'simulator'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engine import ExecutionEngine, ensure_indexes
+
+DB_NAME = 'amr-bench-startup'
+BATCH = 10000
+ACTIONS = [{'type': 'MOVE', 'config': {'location': '1'}}, {'type': 'MOVE', 'config': {'location': '2'}}]
+
+
+def seed(db, history, fleet):
+    db['task_instances'].drop()
+    db['amrs'].drop()
+    base = datetime.now() - timedelta(days=1)
+    for start in range(0, history, BATCH):
+        db['task_instances'].insert_many([
+            {'status': 'Completed', 'priority': 0, 'created_at': base, 'updated_at': base, 'actions': ACTIONS}
+            for _ in range(start, min(history, start + BATCH))
+        ])
+    amrs = []
+    for i in range(fleet):
+        amr = {'name': f'AMR-{i:04d}', 'status': 'IDLE', 'task_instance_id': None}
+        if i % 2 == 0:
+            instance_id = db['task_instances'].insert_one({
+                'status': 'In Progress', 'claimed_by': 0, 'amr_name': amr['name'], 'priority': 0,
+                'created_at': base, 'updated_at': base, 'actions': ACTIONS, 'current_action_index': 1,
+            }).inserted_id
+            amr.update(status='BUSY', task_instance_id=str(instance_id))
+        amrs.append(amr)
+    db['amrs'].insert_many(amrs)
+    # Claims whose AMR write never happened
+    db['task_instances'].insert_many([
+        {'status': 'In Progress', 'claimed_by': 0, 'priority': 0, 'created_at': base, 'updated_at': base,
+         'actions': ACTIONS} for _ in range(fleet // 10)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--history', default='0,100000,1000000', help='terminal instances to seed')
+    parser.add_argument('--fleet', type=int, default=500)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[DB_NAME]
+    print(f"{'history':>9} {'indexes s':>10} {'load s':>8} {'resumed':>8} {'requeued':>9}")
+    for history in [int(h) for h in args.history.split(',')]:
+        seed(db, history, args.fleet)
+        start = time.perf_counter()
+        ensure_indexes(db)
+        indexes = time.perf_counter() - start
+        engine = ExecutionEngine(db)
+        start = time.perf_counter()
+        stats = engine.load()
+        load = time.perf_counter() - start
+        print(f"{history:>9} {indexes:>10.3f} {load:>8.3f} {stats['resumed']:>8} {stats['requeued']:>9}")
+    db.client.drop_database(DB_NAME)
+
+
+if __name__ == '__main__':
+    main()
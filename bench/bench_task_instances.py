@@ -0,0 +1,83 @@
+"""
+Round-trip benchmark for GET /task-instances.
+
+Seeds a scratch database with N task instances spread over a handful of
+Tasks, calls the listing route through the Flask test client and counts
+the Mongo commands it issues. The count should stay flat as N grows.
+
+Usage:
+    python bench/bench_task_instances.py --mongo-uri mongodb://localhost:27017/amr-bench
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/amr-bench')
+    parser.add_argument('--sizes', default='10,100,1000,5000')
+    parser.add_argument('--tasks', type=int, default=20)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    # Listeners only attach to clients created after registration
+    monitoring.register(counter)
+
+    # app connects on import, so the URI has to be in place first
+    os.environ['MONGODB_URI'] = args.mongo_uri
+    from app import app, Task, TaskInstance
+
+    client = app.test_client()
+    print(f"{'instances':>10} {'mongo cmds':>11} {'ms':>9}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        Task.objects.delete()
+        TaskInstance.objects.delete()
+        tasks = [
+            Task(name=f'task-{i}', actions=[{'type': 'MOVE', 'config': {'location': i}}]).save()
+            for i in range(args.tasks)
+        ]
+        # Versioned instances, as POST /execute-sequence writes them
+        now = datetime.now()
+        TaskInstance.objects.insert([
+            TaskInstance(task_id=str(task.id), status='Queued', task_version=task.version,
+                         total_actions=len(task.actions), created_at=now, updated_at=now)
+            for task in (tasks[i % len(tasks)] for i in range(size))
+        ], load_bulk=False)
+
+        counter.count = 0
+        start = time.perf_counter()
+        response = client.get('/task-instances')
+        # The listing is streamed, so the work happens while the body is read
+        listed = len(response.get_json()['task_instances'])
+        response.close()
+        elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code == 200 and listed == size
+        print(f"{size:>10} {counter.count:>11} {elapsed:>9.1f}")
+
+    Task.objects.delete()
+    TaskInstance.objects.delete()
+
+
+if __name__ == '__main__':
+    main()
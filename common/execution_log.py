@@ -0,0 +1,171 @@
+"""
+Append-only log of execution state transitions (claims, finished actions,
+pauses, cancellations, dispatch outcomes).
+
+record() only appends to an in-memory buffer; a background thread writes
+it with insert_many every EXECUTION_LOG_FLUSH_SECONDS, or as soon as
+EXECUTION_LOG_BATCH_SIZE events are waiting, so no hot path waits on the
+log. Events go to a time-series collection when the server has them
+(MongoDB 5+), otherwise to a plain collection with a TTL index; either way
+they expire after EXECUTION_LOG_RETENTION_DAYS.
+
+Shared by the backend and the simulator.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+EXECUTION_LOG_FLUSH_SECONDS = float(os.environ.get('EXECUTION_LOG_FLUSH_SECONDS', '1'))
+EXECUTION_LOG_BATCH_SIZE = int(os.environ.get('EXECUTION_LOG_BATCH_SIZE', '500'))
+EXECUTION_LOG_RETENTION_DAYS = float(os.environ.get('EXECUTION_LOG_RETENTION_DAYS', '7'))
+# Events kept in memory while Mongo is slow or down; the oldest are dropped beyond this
+EXECUTION_LOG_MAX_BUFFER = int(os.environ.get('EXECUTION_LOG_MAX_BUFFER', '100000'))
+
+COLLECTION = 'execution_events'
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BOUNDARIES = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300)
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_collection(db, retention_seconds):
+    """Create the event collection on first use: time-series where supported, TTL-indexed otherwise."""
+    collection = db[COLLECTION]
+    if COLLECTION in db.list_collection_names():
+        return collection
+    try:
+        db.create_collection(
+            COLLECTION,
+            timeseries={'timeField': 'at', 'metaField': 'meta', 'granularity': 'seconds'},
+            expireAfterSeconds=int(retention_seconds),
+        )
+    except CollectionInvalid:
+        # Created concurrently by the other service
+        return collection
+    except OperationFailure:
+        # No time-series collections on this server
+        collection.create_index('at', expireAfterSeconds=int(retention_seconds))
+    try:
+        collection.create_index([('meta.event', 1), ('at', 1)])
+        collection.create_index([('task_instance_id', 1), ('at', 1)])
+    except OperationFailure as e:
+        # MongoDB 5.0 time-series collections only index the meta and time fields; reads still work, unindexed
+        logger.warning(f"Execution log indexes not created: {e}")
+    return collection
+
+
+class ExecutionLog:
+    """Buffered writer for execution events; see the module docstring."""
+
+    def __init__(self, flush_seconds=EXECUTION_LOG_FLUSH_SECONDS, batch_size=EXECUTION_LOG_BATCH_SIZE,
+                 retention_days=EXECUTION_LOG_RETENTION_DAYS, max_buffer=EXECUTION_LOG_MAX_BUFFER):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.retention_seconds = retention_days * 86400
+        self._buffer = deque()
+        self._max_buffer = max_buffer
+        self._cond = threading.Condition()
+        self._thread = None
+        self.collection = None
+        self.source = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self, db, source):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self.source = source
+            self.collection = ensure_collection(db, self.retention_seconds)
+            self._thread = threading.Thread(target=self._run, name='execution-log', daemon=True)
+            self._thread.start()
+
+    def record(self, event, task_instance_id, **fields):
+        """Queue one event; fields such as amr_name, action_index, action_type and duration (seconds)."""
+        doc = {
+            'at': datetime.now(),
+            'meta': {'source': self.source, 'event': event},
+            'task_instance_id': str(task_instance_id),
+        }
+        doc.update((key, value) for key, value in fields.items() if value is not None)
+        with self._cond:
+            if len(self._buffer) >= self._max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(doc)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if batch and self.collection is not None:
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Dropped {len(batch)} execution events: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+            self.flush()
+
+
+def latency_histogram(collection, event='action_completed', since=None, until=None,
+                      boundaries=DEFAULT_BOUNDARIES, group_by='action_type'):
+    """
+    Duration histogram of `event` per `group_by` value, computed in one
+    aggregation. Each bucket counts events with duration <= `le` (and above
+    the previous bound); the last bucket has le='+Inf'.
+    """
+    match = {'meta.event': event, 'duration': {'$exists': True}}
+    if since or until:
+        match['at'] = {}
+        if since:
+            match['at']['$gte'] = since
+        if until:
+            match['at']['$lt'] = until
+    boundaries = sorted(boundaries)
+    bucket = {'$switch': {
+        'branches': [{'case': {'$lte': ['$duration', bound]}, 'then': bound} for bound in boundaries],
+        'default': '+Inf',
+    }}
+    rows = collection.aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': {'key': f'${group_by}', 'le': bucket},
+            'count': {'$sum': 1},
+            'sum': {'$sum': '$duration'},
+            'max': {'$max': '$duration'},
+        }},
+    ])
+    result = {}
+    for row in rows:
+        key = row['_id'].get('key') or 'unknown'
+        entry = result.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                        'buckets': {le: 0 for le in list(boundaries) + ['+Inf']}})
+        entry['count'] += row['count']
+        entry['sum'] += row['sum']
+        entry['max'] = max(entry['max'], row['max'])
+        entry['buckets'][row['_id']['le']] += row['count']
+    return {
+        key: {
+            'count': entry['count'],
+            'mean': round(entry['sum'] / entry['count'], 3) if entry['count'] else None,
+            'max': round(entry['max'], 3),
+            'buckets': [{'le': le, 'count': count} for le, count in entry['buckets'].items()],
+        }
+        for key, entry in result.items()
+    }
+
+
+execution_log = ExecutionLog()
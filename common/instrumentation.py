@@ -0,0 +1,321 @@
+"""
+Opt-in request instrumentation (INSTRUMENTATION=1).
+
+- Every Mongo command is counted and timed through pymongo command
+  monitoring; the listener is registered on import, so import this module
+  before the Mongo client is created.
+- Each request accumulates Mongo, outbound HTTP (`timed('http')`) and JSON
+  serialization time, returned in a Server-Timing header. A streamed
+  body is timed until the server has written it, so its histograms and
+  profile cover the body but it carries no Server-Timing header.
+- Everything is aggregated into counters and histograms served as
+  Prometheus text at /metrics.
+- With PROFILE_SLOW_MS set, a sampling profiler records the stacks of
+  in-flight requests and writes folded stacks (flamegraph.pl / speedscope
+  input) for requests slower than the threshold to PROFILE_DIR.
+
+Shared by the backend and the simulator.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from pymongo import monitoring
+
+ENABLED = os.environ.get('INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+# Requests at least this slow get their sampled stacks written out; 0 disables the profiler
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('mongo', 'http', 'serialize')
+
+_local = threading.local()
+
+
+class Metrics:
+    """Thread-safe counters, histograms and callback gauges rendered in Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, value=1, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += value
+
+    def gauge(self, name, callback, kind='gauge'):
+        """Register a value read from `callback()` at scrape time; kind='counter' for running totals."""
+        self._gauges[name] = (callback, kind)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        labels = tuple(labels) + tuple(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{str(v)}"' for k, v in labels) + '}'
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{self._labels(labels)} {value}')
+        for (name, labels), (counts, count, total) in sorted(histograms.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {bucket_count}')
+            lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {total}')
+            lines.append(f'{name}_count{self._labels(labels)} {count}')
+        for name, (callback, kind) in sorted(self._gauges.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Counts and times every command; adds to the current request's Mongo phase when there is one."""
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        labels = {'command': event.command_name}
+        metrics.inc('mongo_commands_total', labels=labels)
+        metrics.observe('mongo_command_duration_seconds', seconds, labels)
+        _add_phase('mongo', seconds)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        metrics.inc('mongo_command_failures_total', labels={'command': event.command_name})
+        self._record(event)
+
+
+def _add_phase(phase, seconds):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[phase][0] += 1
+        timings[phase][1] += seconds
+
+
+@contextmanager
+def timed(phase):
+    """Attribute the enclosed block to `phase` of the current request (no-op when disabled)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_phase(phase, time.perf_counter() - start)
+
+
+@contextmanager
+def timer(name, labels=None):
+    """Observe the duration of the enclosed block in histogram `name` (no-op when disabled)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - start, labels)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads currently serving a request every
+    `interval` seconds. A request's samples are kept only if it ends up
+    slower than `slow_seconds`, as one folded-stack file per request.
+    """
+
+    def __init__(self, slow_seconds, interval, directory):
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.directory = directory
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def begin(self):
+        self.start()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, label, seconds):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or seconds < self.slow_seconds:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        name = ''.join(c if c.isalnum() else '_' for c in label).strip('_')
+        path = os.path.join(self.directory, f"{datetime.now():%Y%m%dT%H%M%S%f}-{name}-{seconds * 1000:.0f}ms.folded")
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[self._fold(frame)] += 1
+
+
+profiler = SamplingProfiler(PROFILE_SLOW_MS / 1000, PROFILE_INTERVAL_MS / 1000, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+if ENABLED:
+    monitoring.register(MongoCommandTimer())
+
+
+def server_timing(timings, total):
+    parts = []
+    for phase in PHASES:
+        count, seconds = timings[phase]
+        if count:
+            parts.append(f'{phase};dur={seconds * 1000:.2f};desc="{count} calls"')
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def init_app(app):
+    """Install the request hooks, the timed JSON provider and /metrics when instrumentation is enabled."""
+    if not ENABLED:
+        return
+    from flask import Response, request
+
+    # Time serialization through whichever JSON provider the app uses
+    provider = app.json
+    dumps = provider.dumps
+
+    def timed_dumps(obj, **kwargs):
+        with timed('serialize'):
+            return dumps(obj, **kwargs)
+
+    provider.dumps = timed_dumps
+
+    @app.before_request
+    def start_request_timing():
+        _local.timings = {phase: [0, 0.0] for phase in PHASES}
+        _local.started = time.perf_counter()
+        _local.streaming = False
+        if profiler is not None:
+            profiler.begin()
+
+    def record(timings, started, method, route, status):
+        total = time.perf_counter() - started
+        metrics.inc('http_requests_total', labels={'method': method, 'route': route, 'status': status})
+        metrics.observe('http_request_duration_seconds', total, {'method': method, 'route': route})
+        for phase in PHASES:
+            if timings[phase][0]:
+                metrics.observe('http_request_phase_seconds', timings[phase][1], {'route': route, 'phase': phase})
+        if profiler is not None:
+            path = profiler.end(f'{method} {route}', total)
+            if path:
+                metrics.inc('profiles_written_total', labels={'route': route})
+        return total
+
+    @app.after_request
+    def finish_request_timing(response):
+        timings = getattr(_local, 'timings', None)
+        if timings is None:
+            return response
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        response.headers['Timing-Allow-Origin'] = '*'
+        if response.is_streamed:
+            # The body is produced after this hook, so it is timed (and profiled) until the
+            # server closes it; its headers are already out by then, so no Server-Timing
+            started, method, status = _local.started, request.method, response.status_code
+            _local.streaming = True
+
+            def finish_streamed_timing():
+                record(timings, started, method, route, status)
+                _local.streaming = False
+                _local.timings = None
+
+            response.call_on_close(finish_streamed_timing)
+            return response
+        total = record(timings, _local.started, request.method, route, response.status_code)
+        response.headers['Server-Timing'] = server_timing(timings, total)
+        return response
+
+    @app.teardown_request
+    def clear_request_timing(exc):
+        # A streamed body is still being written (and timed) after teardown
+        if getattr(_local, 'streaming', False):
+            return
+        _local.timings = None
+        if profiler is not None:
+            profiler.end('', 0)
+
+    def metrics_view():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
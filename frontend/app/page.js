@@ -1,11 +1,12 @@
 "use client"
 
-import { useState, useEffect } from "react"
+import { useState, useEffect, useRef } from "react"
 import Link from "next/link"
 import TaskProgressBar from "@/components/progress-bar"
 import {
   fetchTasks,
   fetchTaskInstances,
+  fetchTaskInstanceChanges,
   createTaskInstance,
   startTaskInstance,
   pauseTaskInstance,
@@ -25,11 +26,29 @@ export default function Dashboard() {
   const [showProgressModal, setShowProgressModal] = useState(false)
   const [selectedInstance, setSelectedInstance] = useState(null)
 
+  const watermarkRef = useRef(null)
+
   useEffect(() => {
     async function updateTaskInstances() {
       try {
-        const instancesData = await fetchTaskInstances();
-        setAssignedTasks(instancesData);
+        // Only instances changed since the last poll come back
+        const changes = await fetchTaskInstanceChanges(watermarkRef.current);
+        watermarkRef.current = changes.watermark;
+        if (changes.reset) {
+          setAssignedTasks(changes.task_instances);
+          return;
+        }
+        const removed = new Set(changes.removed);
+        const changed = new Map(changes.task_instances.map((instance) => [instance.id, instance]));
+        setAssignedTasks((current) => {
+          const known = new Set(current.map((instance) => instance.id));
+          return [
+            ...current
+              .filter((instance) => !removed.has(instance.id))
+              .map((instance) => changed.get(instance.id) || instance),
+            ...changes.task_instances.filter((instance) => !known.has(instance.id)),
+          ];
+        });
       } catch (err) {
         console.error(`Failed to update task instances: ${err.message}`);
       }
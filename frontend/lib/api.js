@@ -45,6 +45,17 @@ export async function fetchTasks() {
     }
   }
   
+  export async function fetchTaskInstanceChanges(since) {
+    try {
+      const response = await api.get("/task-instances/changes", { params: since ? { since } : {} })
+      const data = await response.data
+      return data
+    } catch (error) {
+      console.error("Error fetching task instance changes:", error)
+      throw error
+    }
+  }
+  
   export async function createTaskInstance(instanceData) {
     try {
       const response = await api.post("/execute-sequence", instanceData)
@@ -0,0 +1,123 @@
+import json
+import math
+import os
+
+from pymongo import ASCENDING, DESCENDING
+
+# JSON file mapping indexed location -> [x, y]; without it numeric locations use |a - b|
+LOCATIONS_FILE = os.environ.get('SIM_LOCATIONS_FILE')
+# How many queued candidates the nearest-robot policy considers per idle AMR
+CANDIDATES_PER_AMR = 4
+MAX_CANDIDATES = 500
+
+
+def move_locations(actions):
+    """Locations of the MOVE actions of a task, in order."""
+    return [
+        (action.get('config') or {}).get('location')
+        for action in actions or []
+        if action.get('type') == 'MOVE' and (action.get('config') or {}).get('location') not in (None, '')
+    ]
+
+
+class LocationIndex:
+    """Distances between indexed locations, from a coordinates file when one is configured."""
+
+    def __init__(self, coordinates=None):
+        self.coordinates = {str(k): tuple(v) for k, v in (coordinates or {}).items()}
+
+    @classmethod
+    def from_file(cls, path=LOCATIONS_FILE):
+        if not path:
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def distance(self, a, b):
+        if a is None or b is None:
+            return 0.0
+        a, b = str(a), str(b)
+        if a in self.coordinates and b in self.coordinates:
+            (ax, ay), (bx, by) = self.coordinates[a], self.coordinates[b]
+            return math.hypot(ax - bx, ay - by)
+        try:
+            return abs(float(a) - float(b))
+        except ValueError:
+            return 0.0 if a == b else 1.0
+
+
+class QueueOrderPolicy:
+    """Idle AMRs take instances in queue order, one atomic claim each."""
+
+    def __init__(self, order):
+        self.order = order
+
+    def assign(self, engine, idle):
+        """Returns (claimed pairs, whether the queue ran dry)."""
+        claimed = []
+        for amr in idle:
+            doc = engine.claim(amr, sort=self.order)
+            if doc is None:
+                return claimed, True
+            claimed.append((amr, doc))
+        return claimed, False
+
+
+class NearestRobotPolicy:
+    """
+    Matches all idle AMRs against a window of queued instances per tick,
+    pairing the closest AMR/first-MOVE locations first (greedy matching).
+    Chosen instances are then claimed by id; one lost to another worker
+    is simply left for the next tick. A round that claims nothing reports
+    the queue as dry, so lost races wait for the next announcement of work
+    instead of spinning the engine loop.
+    """
+
+    order = [('priority', DESCENDING), ('created_at', ASCENDING)]
+
+    def __init__(self, locations=None):
+        self.locations = locations or LocationIndex.from_file()
+
+    def match(self, idle, candidates):
+        """Pair AMRs with candidate docs. Pure function, shared with the benchmark."""
+        pairs = []
+        for amr in idle:
+            for position, doc in enumerate(candidates):
+                targets = move_locations(doc.get('actions'))
+                cost = self.locations.distance(amr.location, targets[0] if targets else None)
+                # Queue position breaks ties so equal distances stay FIFO/priority ordered
+                pairs.append((cost, position, amr, doc))
+        pairs.sort(key=lambda pair: (pair[0], pair[1]))
+        used_amrs, used_docs, matched = set(), set(), []
+        for cost, position, amr, doc in pairs:
+            if id(amr) in used_amrs or position in used_docs:
+                continue
+            used_amrs.add(id(amr))
+            used_docs.add(position)
+            matched.append((amr, doc))
+        return matched
+
+    def assign(self, engine, idle):
+        """Returns (claimed pairs, whether the queue ran dry)."""
+        limit = min(MAX_CANDIDATES, CANDIDATES_PER_AMR * len(idle))
+        candidates = engine.definitions.resolve(list(engine.task_instances_collection.find(
+            {'status': 'Queued'}, {'task_id': 1, 'task_version': 1, 'actions': 1}).sort(self.order).limit(limit)))
+        claimed = []
+        for amr, doc in self.match(idle, candidates):
+            doc = engine.claim(amr, task_instance_id=doc['_id'])
+            if doc is not None:
+                claimed.append((amr, doc))
+        return claimed, len(candidates) < len(idle) or not claimed
+
+
+POLICIES = {
+    'fifo': lambda: QueueOrderPolicy([('created_at', ASCENDING)]),
+    'priority': lambda: QueueOrderPolicy([('priority', DESCENDING), ('created_at', ASCENDING)]),
+    'nearest': NearestRobotPolicy,
+}
+
+
+def make_policy(name):
+    if name not in POLICIES:
+        raise ValueError(f"Unknown assignment policy {name!r}, expected one of {', '.join(POLICIES)}")
+    return POLICIES[name]()
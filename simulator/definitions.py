@@ -0,0 +1,58 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Task versions whose actions are kept in memory; they never change, so nothing is invalidated
+DEFINITION_CACHE_SIZE = int(os.environ.get('SIM_DEFINITION_CACHE_SIZE', '1024'))
+COLLECTION = 'task_versions'
+
+
+class TaskDefinitions:
+    """
+    Actions of immutable Task versions, keyed '<task_id>:<version>' like
+    the backend's task_versions collection. Task instances only reference
+    (task_id, task_version); resolve() fills in their actions from this
+    LRU, loading misses with one $in query.
+    """
+
+    def __init__(self, collection, maxsize=DEFINITION_CACHE_SIZE):
+        self.collection = collection
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, docs):
+        """
+        Set doc['actions'] on instance documents projected with task_id and
+        task_version. Instances from before versioning still embed their
+        actions and are left as they are; unknown versions get [].
+        """
+        pending = [doc for doc in docs if doc.get('actions') is None and doc.get('task_version') is not None]
+        if not pending:
+            return docs
+        keys = {f"{doc['task_id']}:{doc['task_version']}" for doc in pending}
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                actions = self._entries.get(key)
+                if actions is None:
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = actions
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            for version in self.collection.find({'_id': {'$in': missing}}, {'actions': 1}):
+                found[version['_id']] = version.get('actions') or []
+            with self._lock:
+                for key in missing:
+                    if key in found:
+                        self._entries[key] = found[key]
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        for doc in pending:
+            doc['actions'] = found.get(f"{doc['task_id']}:{doc['task_version']}", [])
+        return docs
@@ -0,0 +1,676 @@
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+from assignment import make_policy, move_locations
+from common.execution_log import execution_log
+from common.instrumentation import timer
+from definitions import TaskDefinitions
+from travel import action_durations, forecast, travel_times
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long the engine sleeps when nothing is due
+IDLE_WAKE_SECONDS = 1.0
+# Instance statuses that hold the AMR but stop the clock
+PAUSED_STATUSES = ('Paused', 'Stopped')
+# Claim order: highest priority first, then oldest
+QUEUE_ORDER = [('priority', DESCENDING), ('created_at', ASCENDING)]
+# A claim is valid until lease_expires_at; heartbeats renew it every LEASE_SECONDS / 3
+LEASE_SECONDS = float(os.environ.get('SIM_LEASE_SECONDS', '30'))
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+# How often expired leases are looked for, and how many are reclaimed per pass
+SWEEP_SECONDS = float(os.environ.get('SIM_SWEEP_SECONDS', '5'))
+SWEEP_BATCH = 1000
+# Simulated robot failures: chance per finished action, and seconds until the robot is back (0 = manual)
+AMR_FAILURE_RATE = float(os.environ.get('SIM_AMR_FAILURE_RATE', '0'))
+AMR_REPAIR_SECONDS = float(os.environ.get('SIM_AMR_REPAIR_SECONDS', '60'))
+# Instance statuses in which an AMR holds the instance
+HELD_STATUSES = ('In Progress',) + PAUSED_STATUSES
+# Queued instances considered by one forecast, in claim order
+FORECAST_LIMIT = int(os.environ.get('SIM_FORECAST_LIMIT', '10000'))
+
+
+def ensure_indexes(db):
+    """Indexes the claim query and the AMR lookups rely on."""
+    db['task_instances'].create_index(
+        [('status', ASCENDING)] + QUEUE_ORDER, name='status_priority_created_at')
+    # Plain FIFO claim order
+    db['task_instances'].create_index([('status', ASCENDING), ('created_at', ASCENDING)])
+    db['amrs'].create_index('task_instance_id')
+    # Startup recovery looks up this worker's claims
+    db['task_instances'].create_index([('claimed_by', ASCENDING), ('status', ASCENDING)])
+    # The sweeper only reads leases that exist, so its cost follows live claims, not history
+    db['task_instances'].create_index('lease_expires_at', sparse=True)
+
+
+def lease_deadline():
+    return datetime.now() + timedelta(seconds=LEASE_SECONDS)
+
+
+def claim_next(task_instances_collection, amr_name, worker_id, sort=QUEUE_ORDER, task_instance_id=None):
+    """
+    Atomically move the next Queued instance (or the given one) to In
+    Progress for `amr_name`.
+
+    The status predicate and the update happen in one findOneAndUpdate, so
+    two workers can never claim the same instance. Returns the claimed
+    document, or None when nothing Queued matched.
+    """
+    query = {'status': 'Queued'}
+    if task_instance_id is not None:
+        query['_id'] = ObjectId(task_instance_id)
+    return task_instances_collection.find_one_and_update(
+        query,
+        {'$set': {
+            'status': 'In Progress',
+            'current_action_index': 0,
+            'amr_name': amr_name,
+            'claimed_by': worker_id,
+            'started_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'lease_expires_at': lease_deadline(),
+        }},
+        sort=sort,
+        projection={'task_id': 1, 'task_version': 1, 'actions': 1, 'created_at': 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _destination(actions):
+    locations = move_locations(actions)
+    return locations[-1] if locations else None
+
+
+def _action_type(amr):
+    if amr.action_index < len(amr.action_types):
+        return amr.action_types[amr.action_index]
+    return None
+
+
+def _since(started, now):
+    return round(now - started, 3) if started is not None else None
+
+
+def _update(fields, now):
+    update = {'$set': dict({k: v for k, v in fields.items() if v is not None}, updated_at=now)}
+    unset = {k: '' for k, v in fields.items() if v is None}
+    if unset:
+        update['$unset'] = unset
+    return update
+
+
+def _changed(query, fields):
+    """Extend `query` to match only when at least one of `fields` differs from the stored value."""
+    return dict(query, **{'$or': [{key: {'$ne': value}} for key, value in fields.items()]})
+
+
+class AMRState:
+    __slots__ = ('id', 'name', 'status', 'task_instance_id', 'action_index', 'durations',
+                 'due_at', 'remaining', 'paused', 'location', 'destination',
+                 'action_types', 'claimed_at', 'action_started_at', 'failed')
+
+    def __init__(self, doc):
+        self.id = doc['_id']
+        self.name = doc['name']
+        self.status = doc.get('status', 'IDLE')
+        self.task_instance_id = doc.get('task_instance_id')
+        self.action_index = 0
+        self.durations = []
+        self.due_at = None
+        self.remaining = None
+        self.paused = False
+        # Last known indexed location, and where the current task leaves the AMR
+        self.location = doc.get('location')
+        self.destination = None
+        # For the execution log: action types and monotonic start times of the task and current action
+        self.action_types = []
+        self.claimed_at = None
+        self.action_started_at = None
+        # Simulated breakdown: the AMR stops working and stops renewing its lease
+        self.failed = False
+
+    def free(self):
+        self.status = 'IDLE'
+        self.task_instance_id = None
+        self.action_index = 0
+        self.durations = []
+        self.due_at = None
+        self.remaining = None
+        self.paused = False
+        self.destination = None
+        self.action_types = []
+        self.claimed_at = None
+        self.action_started_at = None
+
+
+class ExecutionEngine:
+    """
+    Event-driven replacement for the once-a-minute process_tasks scan.
+
+    AMR state lives in memory. The engine thread sleeps until either work
+    is announced or the earliest running action is due (actions last as
+    long as travel.action_durations estimates), then advances every due
+    AMR and persists the resulting changes with one bulk write per
+    collection. Idle AMRs take work from Mongo with claim_next(), so any
+    number of engines can share one queue; each engine drives the slice
+    of the fleet given by worker_id/worker_count.
+    """
+
+    def __init__(self, db, worker_id=0, worker_count=1, policy=None, travel=None):
+        self.amrs_collection = db['amrs']
+        self.task_instances_collection = db['task_instances']
+        # Instances reference a Task version; its actions are resolved once and cached
+        self.definitions = TaskDefinitions(db['task_versions'])
+        # MOVE actions take the shortest travel time on the map
+        self.travel = travel if travel is not None else travel_times
+        self.worker_id = worker_id
+        self.worker_count = worker_count
+        self.policy = policy or make_policy('priority')
+        self.amrs = {}
+        # Idle AMRs, longest idle first, so finding work for them never scans the whole fleet
+        self.idle = {}
+        self.by_instance = {}
+        # Set when Queued work may exist; cleared when a claim comes back empty
+        self.work_available = True
+        self.timers = []
+        self.cond = threading.Condition()
+        # Changes made under the lock, persisted in bulk once it is released
+        self._instance_writes = {}
+        self._amr_writes = {}
+        self._thread = None
+        self._stop = False
+
+    # -- loading ---------------------------------------------------------
+
+    def load(self):
+        """
+        Rebuild in-memory state from Mongo with one read per collection.
+        Instances this worker had claimed but no AMR holds any more (a crash
+        between the claim and the AMR write) are put back in the queue.
+        Resumed instances claimed before leases existed are given the claim
+        fields, so the engine's writes and the sweeper see them.
+        Returns counts of loaded AMRs, resumed and requeued instances.
+        """
+        with self.cond:
+            self.amrs.clear()
+            self.by_instance.clear()
+            self.timers = []
+            self.work_available = True
+            docs = self.amrs_collection.find(
+                {}, {'name': 1, 'status': 1, 'task_instance_id': 1, 'location': 1}).sort('name', 1)
+            for position, doc in enumerate(docs):
+                if position % self.worker_count != self.worker_id:
+                    continue
+                amr = AMRState(doc)
+                self.amrs[amr.name] = amr
+            busy = {amr.task_instance_id: amr for amr in self.amrs.values() if amr.task_instance_id}
+
+            instances = self.definitions.resolve(list(self.task_instances_collection.find(
+                {'_id': {'$in': [ObjectId(i) for i in busy if ObjectId.is_valid(i)]}},
+                {'status': 1, 'task_id': 1, 'task_version': 1, 'actions': 1, 'current_action_index': 1,
+                 'amr_name': 1},
+            )))
+            now = time.monotonic()
+            adopted = []
+            for doc in instances:
+                task_instance_id = str(doc['_id'])
+                amr = busy.get(task_instance_id)
+                if amr is not None and doc['status'] not in ('Completed', 'Cancelled', 'Failed'):
+                    amr.status = 'BUSY'
+                    amr.durations = action_durations(doc.get('actions'), amr.location, self.travel)
+                    amr.destination = _destination(doc.get('actions'))
+                    amr.action_index = doc.get('current_action_index', 0)
+                    amr.action_types = [action.get('type') for action in doc.get('actions') or []]
+                    amr.claimed_at = amr.action_started_at = now
+                    amr.paused = doc['status'] in PAUSED_STATUSES
+                    self.by_instance[task_instance_id] = amr
+                    if 'amr_name' not in doc:
+                        adopted.append(UpdateOne({'_id': doc['_id'], 'amr_name': {'$exists': False}}, {'$set': {
+                            'amr_name': amr.name, 'claimed_by': self.worker_id, 'lease_expires_at': lease_deadline()}}))
+                    if amr.paused:
+                        amr.remaining = self._duration(amr)
+                    else:
+                        self._schedule(amr, now)
+            if adopted:
+                self.task_instances_collection.bulk_write(adopted, ordered=False)
+            # AMRs without a live instance are free again
+            self.idle = {}
+            for amr in self.amrs.values():
+                if amr.task_instance_id not in self.by_instance:
+                    stale = amr.status != 'IDLE' or amr.task_instance_id
+                    self._free(amr)
+                    if stale:
+                        self._write_amr(amr)
+            requeued = self.task_instances_collection.update_many(
+                {'claimed_by': self.worker_id, 'status': {'$in': HELD_STATUSES},
+                 '_id': {'$nin': [ObjectId(i) for i in self.by_instance]}},
+                {'$set': {'status': 'Queued', 'current_action_index': 0, 'updated_at': datetime.now()},
+                 '$unset': {'amr_name': '', 'claimed_by': '', 'started_at': '', 'lease_expires_at': ''}},
+            ).modified_count
+            stats = {'amrs': len(self.amrs), 'resumed': len(self.by_instance), 'requeued': requeued}
+            self.cond.notify()
+            writes = self._take_writes()
+        self._flush(*writes)
+        return stats
+
+    def reconcile(self):
+        """
+        Catch up with writes made outside this engine, such as a status
+        change through the backend's PUT /task-instances or work queued
+        through another simulator process. Costs one query over the
+        instances the engine holds and one indexed probe of the queue.
+        """
+        with self.cond:
+            held = list(self.by_instance)
+        statuses = {
+            str(doc['_id']): doc['status']
+            for doc in self.task_instances_collection.find(
+                {'_id': {'$in': [ObjectId(i) for i in held]}}, {'status': 1})
+        } if held else {}
+        has_queued = self.task_instances_collection.find_one({'status': 'Queued'}, {'_id': 1}) is not None
+
+        with self.cond:
+            for task_instance_id in held:
+                amr = self.by_instance.get(task_instance_id)
+                if amr is None:
+                    continue
+                status = statuses.get(task_instance_id)
+                if status in PAUSED_STATUSES:
+                    if not amr.paused:
+                        execution_log.record('paused', task_instance_id, amr_name=amr.name,
+                                             action_index=amr.action_index, status=status)
+                    self._pause_locked(amr)
+                elif status == 'In Progress':
+                    if amr.paused:
+                        execution_log.record('resumed', task_instance_id, amr_name=amr.name,
+                                             action_index=amr.action_index)
+                    self._resume_locked(amr)
+                else:
+                    # Finished, cancelled, requeued or deleted behind our back
+                    execution_log.record('released', task_instance_id, amr_name=amr.name,
+                                         action_index=amr.action_index, status=status)
+                    self.by_instance.pop(task_instance_id, None)
+                    self._free(amr)
+                    self._write_amr(amr)
+            if has_queued:
+                self.work_available = True
+            self.cond.notify()
+            writes = self._take_writes()
+        self._flush(*writes)
+
+    def heartbeat(self):
+        """Renew, with one write, the lease of every instance held by a working AMR of this engine."""
+        with self.cond:
+            held = [ObjectId(i) for i, amr in self.by_instance.items() if not amr.failed]
+        if held:
+            self.task_instances_collection.update_many(
+                {'_id': {'$in': held}, 'claimed_by': self.worker_id},
+                {'$set': {'lease_expires_at': lease_deadline()}})
+
+    def sweep(self):
+        """
+        Requeue instances whose lease ran out because their engine or AMR
+        stopped heartbeating, and free the AMRs holding them. Reads through
+        the sparse lease index, so the cost follows the expired leases.
+        Each requeue is conditional on the lease read, so a renewal that
+        lands in between wins. Returns the number of requeued instances.
+        """
+        now = datetime.now()
+        expired = list(self.task_instances_collection.find(
+            {'lease_expires_at': {'$lt': now}}, {'status': 1, 'lease_expires_at': 1, 'amr_name': 1}
+        ).limit(SWEEP_BATCH))
+        if not expired:
+            return 0
+        requests, candidates = [], {}
+        for doc in expired:
+            match = {'_id': doc['_id'], 'lease_expires_at': doc['lease_expires_at']}
+            if doc['status'] in HELD_STATUSES:
+                requests.append(UpdateOne(match, {
+                    '$set': {'status': 'Queued', 'current_action_index': 0, 'updated_at': now},
+                    '$unset': {'amr_name': '', 'claimed_by': '', 'started_at': '', 'lease_expires_at': ''},
+                }))
+                candidates[doc['_id']] = doc.get('amr_name')
+            else:
+                # Finished or cancelled outside the engine; the lease just needs clearing
+                requests.append(UpdateOne(match, {'$unset': {'lease_expires_at': ''}}))
+        self.task_instances_collection.bulk_write(requests, ordered=False)
+        requeued = [str(doc['_id']) for doc in self.task_instances_collection.find(
+            {'_id': {'$in': list(candidates)}, 'status': 'Queued'}, {'_id': 1})] if candidates else []
+        if not requeued:
+            return 0
+        self.amrs_collection.update_many(
+            {'task_instance_id': {'$in': requeued}}, {'$set': {'status': 'IDLE', 'task_instance_id': None}})
+
+        with self.cond:
+            for task_instance_id in requeued:
+                execution_log.record('lease_expired', task_instance_id,
+                                     amr_name=candidates.get(ObjectId(task_instance_id)))
+                amr = self.by_instance.pop(task_instance_id, None)
+                if amr is not None:
+                    self._free(amr)
+                    self._write_amr(amr)
+            self.work_available = True
+            self.cond.notify()
+            writes = self._take_writes()
+        self._flush(*writes)
+        logger.info(f"Requeued {len(requeued)} task instances with expired leases")
+        return len(requeued)
+
+    # -- commands from the HTTP routes -----------------------------------
+
+    def notify_work(self):
+        """Wake the engine because new Queued instances were written."""
+        with self.cond:
+            self.work_available = True
+            self.cond.notify()
+
+    def pause(self, task_instance_id):
+        with self.cond:
+            amr = self.by_instance.get(str(task_instance_id))
+            if amr is not None:
+                self._pause_locked(amr)
+
+    def resume(self, task_instance_id):
+        with self.cond:
+            amr = self.by_instance.get(str(task_instance_id))
+            if amr is not None:
+                self._resume_locked(amr)
+                self.cond.notify()
+
+    def cancel(self, task_instance_id):
+        """Free the AMR running an instance. The caller persists the status."""
+        with self.cond:
+            task_instance_id = str(task_instance_id)
+            amr = self.by_instance.pop(task_instance_id, None)
+            if amr is not None:
+                self._free(amr)
+                self.cond.notify()
+
+    def status(self, task_instance_id):
+        """In-memory view of an instance, or None when the engine does not hold it."""
+        with self.cond:
+            task_instance_id = str(task_instance_id)
+            amr = self.by_instance.get(task_instance_id)
+            if amr is not None:
+                return {'amr_name': amr.name, 'current_action_index': amr.action_index,
+                        'total_actions': len(amr.durations), 'paused': amr.paused, 'failed': amr.failed}
+            return None
+
+    def forecast(self, limit=FORECAST_LIMIT):
+        """
+        Predicted seconds until completion of every instance this engine
+        runs and of the first `limit` Queued ones, handed in claim order to
+        this engine's AMRs as they free up. Paused instances and those held
+        by failed AMRs have no estimate (None), and their AMRs take no
+        queued work. Costs one queue read plus a heap step per instance.
+        """
+        with self.cond:
+            now = time.monotonic()
+            etas, available = {}, []
+            for amr in self.amrs.values():
+                if amr.task_instance_id is None:
+                    if not amr.failed:
+                        available.append((0.0, amr.name, amr.location))
+                    continue
+                if amr.paused or amr.failed:
+                    etas[amr.task_instance_id] = None
+                    continue
+                left = (max(0.0, amr.due_at - now) if amr.due_at is not None else 0.0) + \
+                    sum(amr.durations[amr.action_index + 1:])
+                etas[amr.task_instance_id] = left
+                available.append((left, amr.name, amr.destination if amr.destination is not None else amr.location))
+        queued = self.definitions.resolve(list(self.task_instances_collection.find(
+            {'status': 'Queued'}, {'task_id': 1, 'task_version': 1, 'actions': 1}).sort(QUEUE_ORDER).limit(limit)))
+        etas.update(forecast(available, queued, self.travel))
+        return {'etas': etas, 'queued': len(queued), 'truncated': len(queued) >= limit}
+
+    def fail_amr(self, name):
+        """Simulate a breakdown of one AMR. Returns False for AMRs this engine does not drive."""
+        with self.cond:
+            amr = self.amrs.get(name)
+            if amr is None:
+                return False
+            self._fail_locked(amr, time.monotonic())
+            writes = self._take_writes()
+        self._flush(*writes)
+        return True
+
+    def repair_amr(self, name):
+        with self.cond:
+            amr = self.amrs.get(name)
+            if amr is None or not amr.failed:
+                return False
+            self._repair_locked(amr, time.monotonic())
+            self.cond.notify()
+            writes = self._take_writes()
+        self._flush(*writes)
+        return True
+
+    # -- the event loop --------------------------------------------------
+
+    def start(self):
+        with self.cond:
+            if self._thread is not None:
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='execution-engine', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self.cond:
+            self._stop = True
+            self.cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self._stop:
+                    return
+                timeout = IDLE_WAKE_SECONDS
+                if self.timers:
+                    timeout = min(timeout, max(0.0, self.timers[0][0] - time.monotonic()))
+                if not self._has_assignable_work():
+                    self.cond.wait(timeout)
+                if self._stop:
+                    return
+            try:
+                self.process_tasks()
+            except Exception:
+                logger.exception("Error processing tasks")
+                time.sleep(IDLE_WAKE_SECONDS)
+
+    def process_tasks(self):
+        """Advance every due action, fill idle AMRs and persist the changes in bulk."""
+        with timer('engine_tick_seconds'):
+            self._process_tasks()
+
+    def _process_tasks(self):
+        with self.cond:
+            now = time.monotonic()
+            while self.timers and self.timers[0][0] <= now:
+                due_at, _, name = heapq.heappop(self.timers)
+                amr = self.amrs.get(name)
+                # Stale timers (paused, cancelled or rescheduled AMRs) are skipped
+                if amr is None or amr.due_at != due_at:
+                    continue
+                if amr.failed:
+                    self._repair_locked(amr, now)
+                elif not amr.paused:
+                    self._advance(amr, now)
+            idle = list(self.idle.values()) if self.work_available else []
+            writes = self._take_writes()
+        self._flush(*writes)
+
+        # Claims are round trips, so they run without holding the lock
+        with timer('engine_assign_seconds'):
+            claimed, exhausted = self.policy.assign(self, idle) if idle else ([], False)
+        self.definitions.resolve([doc for _, doc in claimed])
+
+        with self.cond:
+            if exhausted:
+                self.work_available = False
+            now = time.monotonic()
+            for amr, doc in claimed:
+                self._assign(amr, str(doc['_id']), doc.get('actions'), now, doc.get('created_at'))
+            writes = self._take_writes()
+        self._flush(*writes)
+
+    def _advance(self, amr, now):
+        task_instance_id = amr.task_instance_id
+        execution_log.record('action_completed', task_instance_id, amr_name=amr.name,
+                             action_index=amr.action_index, action_type=_action_type(amr),
+                             duration=_since(amr.action_started_at, now))
+        if amr.action_index >= len(amr.durations) - 1:
+            execution_log.record('completed', task_instance_id, amr_name=amr.name,
+                                 duration=_since(amr.claimed_at, now))
+            self._write_instance(amr, {'status': 'Completed', 'completed_at': datetime.now(),
+                                       'lease_expires_at': None})
+            self.by_instance.pop(task_instance_id, None)
+            if amr.destination is not None:
+                amr.location = amr.destination
+            self._free(amr)
+            self._write_amr(amr)
+            logger.info(f"Task {task_instance_id} completed by AMR {amr.name}")
+        else:
+            amr.action_index += 1
+            amr.action_started_at = now
+            self._write_instance(amr, {'current_action_index': amr.action_index})
+            self._schedule(amr, now)
+            logger.info(f"AMR {amr.name} moved to action {amr.action_index} for task {task_instance_id}")
+            if AMR_FAILURE_RATE and random.random() < AMR_FAILURE_RATE:
+                self._fail_locked(amr, now)
+
+    def claim(self, amr, sort=QUEUE_ORDER, task_instance_id=None):
+        """Atomically claim work for `amr`; used by the assignment policies."""
+        return claim_next(self.task_instances_collection, amr.name, self.worker_id,
+                          sort=sort, task_instance_id=task_instance_id)
+
+    def _assign(self, amr, task_instance_id, actions, now, created_at=None):
+        self.idle.pop(amr.name, None)
+        amr.status = 'BUSY'
+        amr.task_instance_id = task_instance_id
+        amr.action_index = 0
+        amr.durations = action_durations(actions, amr.location, self.travel)
+        amr.destination = _destination(actions)
+        amr.action_types = [action.get('type') for action in actions or []]
+        amr.claimed_at = amr.action_started_at = now
+        execution_log.record('claimed', task_instance_id, amr_name=amr.name,
+                             duration=round((datetime.now() - created_at).total_seconds(), 3) if created_at else None)
+        self.by_instance[task_instance_id] = amr
+        self._schedule(amr, now)
+        self._write_amr(amr)
+        logger.info(f"Assigned task {task_instance_id} to AMR {amr.name}")
+
+    # -- helpers (called with the lock held) -------------------------------
+
+    def _pause_locked(self, amr):
+        if amr.paused:
+            return
+        amr.paused = True
+        if amr.failed:
+            # The clock already stopped when the AMR failed
+            return
+        amr.remaining = max(0.0, amr.due_at - time.monotonic()) if amr.due_at else self._duration(amr)
+        amr.due_at = None
+
+    def _resume_locked(self, amr):
+        if not amr.paused:
+            return
+        amr.paused = False
+        if amr.failed:
+            # Picks up again once repaired
+            return
+        self._schedule(amr, time.monotonic(), amr.remaining)
+        amr.remaining = None
+
+    def _has_assignable_work(self):
+        return self.work_available and bool(self.idle)
+
+    def _free(self, amr):
+        # A failed AMR's due_at is its repair deadline, which freeing it (a sweep or cancel) must keep
+        repair_at = amr.due_at if amr.failed else None
+        amr.free()
+        if amr.failed:
+            # Out of the pool until repaired
+            amr.status = 'OFFLINE'
+            amr.due_at = repair_at
+        else:
+            self.idle[amr.name] = amr
+
+    def _fail_locked(self, amr, now):
+        if amr.failed:
+            return
+        amr.failed = True
+        if amr.task_instance_id and not amr.paused and amr.due_at is not None:
+            amr.remaining = max(0.0, amr.due_at - now)
+        amr.due_at = None
+        amr.status = 'OFFLINE'
+        self.idle.pop(amr.name, None)
+        if AMR_REPAIR_SECONDS > 0:
+            amr.due_at = now + AMR_REPAIR_SECONDS
+            heapq.heappush(self.timers, (amr.due_at, id(amr), amr.name))
+        self._write_amr(amr)
+        execution_log.record('amr_failed', amr.task_instance_id, amr_name=amr.name, action_index=amr.action_index)
+        logger.info(f"AMR {amr.name} failed while holding task {amr.task_instance_id}")
+
+    def _repair_locked(self, amr, now):
+        amr.failed = False
+        amr.due_at = None
+        if amr.task_instance_id is None:
+            self._free(amr)
+        else:
+            # Lease still valid: carry on where it stopped
+            amr.status = 'BUSY'
+            if not amr.paused:
+                self._schedule(amr, now, amr.remaining)
+                amr.remaining = None
+        self._write_amr(amr)
+        logger.info(f"AMR {amr.name} repaired")
+
+    def _duration(self, amr):
+        if amr.action_index < len(amr.durations):
+            return amr.durations[amr.action_index]
+        return 0.0
+
+    def _schedule(self, amr, now, seconds=None):
+        amr.due_at = now + (self._duration(amr) if seconds is None else seconds)
+        heapq.heappush(self.timers, (amr.due_at, id(amr), amr.name))
+
+    def _write_instance(self, amr, fields):
+        owner, pending = self._instance_writes.setdefault(amr.task_instance_id, (amr.name, {}))
+        pending.update(fields)
+
+    def _write_amr(self, amr):
+        self._amr_writes[amr.id] = {'status': amr.status, 'task_instance_id': amr.task_instance_id,
+                                    'location': amr.location}
+
+    def _take_writes(self):
+        writes = (self._instance_writes, self._amr_writes)
+        self._instance_writes, self._amr_writes = {}, {}
+        return writes
+
+    def _flush(self, instance_writes, amr_writes):
+        # Writes only match documents that differ, so updated_at (and the status ETags) move only on real change
+        now = datetime.now()
+        # Instance writes also require the writing AMR to still hold the claim, so a lease that was
+        # swept and reclaimed elsewhere is never overwritten; None values are unset
+        if instance_writes:
+            self.task_instances_collection.bulk_write([
+                UpdateOne(_changed({'_id': ObjectId(task_instance_id), 'amr_name': owner}, fields), _update(fields, now))
+                for task_instance_id, (owner, fields) in instance_writes.items()
+            ], ordered=False)
+        if amr_writes:
+            self.amrs_collection.bulk_write([
+                UpdateOne(_changed({'_id': amr_id}, fields), {'$set': fields}) for amr_id, fields in amr_writes.items()
+            ], ordered=False)
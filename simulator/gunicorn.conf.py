@@ -0,0 +1,17 @@
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+# gevent workers make the blocking pymongo calls cooperative, so thousands of status polls stay
+# open on a single OS thread.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5050')}"
+# The execution engine lives in the serving process, so there is exactly one worker; run more
+# simulator processes with SIM_WORKER_ID / SIM_WORKER_COUNT to split the fleet instead
+workers = int(os.environ.get('WEB_WORKERS', '1'))
+if workers != 1:
+    raise RuntimeError("The simulator runs one worker; split the fleet with SIM_WORKER_ID / SIM_WORKER_COUNT")
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', '5000'))
+threads = int(os.environ.get('WEB_THREADS', '8'))
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
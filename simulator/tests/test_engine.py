@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+mongomock = pytest.importorskip('mongomock')
+
+import engine as engine_module
+from engine import ExecutionEngine
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()['amr-test']
+
+
+def test_swept_failed_amr_is_repaired(db, monkeypatch):
+    # The lease runs out while the AMR is broken, so the sweep frees it before the repair is due
+    monkeypatch.setattr(engine_module, 'AMR_REPAIR_SECONDS', 0.05)
+    db['amrs'].insert_one({'name': 'AMR-001', 'status': 'IDLE', 'task_instance_id': None})
+    instance_id = db['task_instances'].insert_one({
+        'status': 'Queued', 'priority': 0, 'created_at': datetime.now(),
+        'actions': [{'type': 'WAIT', 'config': {'wait_time': 60}}],
+    }).inserted_id
+    engine = ExecutionEngine(db)
+    engine.load()
+    engine.process_tasks()
+    amr = engine.amrs['AMR-001']
+    assert amr.task_instance_id == str(instance_id)
+
+    engine.fail_amr('AMR-001')
+    db['task_instances'].update_one({'_id': instance_id},
+                                    {'$set': {'lease_expires_at': datetime.now() - timedelta(seconds=1)}})
+    assert engine.sweep() == 1
+    assert amr.status == 'OFFLINE' and amr.task_instance_id is None
+    # Nothing left to claim once repaired, so the AMR has to come back idle
+    db['task_instances'].update_one({'_id': instance_id}, {'$set': {'status': 'Cancelled'}})
+
+    time.sleep(0.1)
+    engine.process_tasks()
+    assert not amr.failed
+    assert amr.status == 'IDLE'
+    assert 'AMR-001' in engine.idle
+    assert db['amrs'].find_one({'name': 'AMR-001'})['status'] == 'IDLE'
+
+
+def test_resumed_instance_without_claim_fields_completes(db):
+    # In Progress from before claims were leased: no amr_name, claimed_by or lease
+    instance_id = db['task_instances'].insert_one({
+        'status': 'In Progress', 'current_action_index': 0, 'created_at': datetime.now(),
+        'actions': [{'type': 'WAIT', 'config': {'wait_time': 0}}],
+    }).inserted_id
+    db['amrs'].insert_one({'name': 'AMR-001', 'status': 'BUSY', 'task_instance_id': str(instance_id)})
+    engine = ExecutionEngine(db)
+    assert engine.load()['resumed'] == 1
+    doc = db['task_instances'].find_one({'_id': instance_id})
+    assert doc['amr_name'] == 'AMR-001' and doc['claimed_by'] == 0 and doc['lease_expires_at']
+
+    engine.process_tasks()
+    assert db['task_instances'].find_one({'_id': instance_id})['status'] == 'Completed'
+    assert engine.amrs['AMR-001'].status == 'IDLE'
+
+
+def test_nearest_policy_backs_off_after_lost_claims(db):
+    from assignment import NearestRobotPolicy
+
+    for n in range(2):
+        db['task_instances'].insert_one({'status': 'Queued', 'priority': 0, 'created_at': datetime.now(),
+                                         'actions': [{'type': 'MOVE', 'config': {'location': str(n)}}]})
+    db['amrs'].insert_one({'name': 'AMR-001', 'status': 'IDLE', 'task_instance_id': None})
+    engine = ExecutionEngine(db, policy=NearestRobotPolicy())
+    engine.load()
+    # Every claim is lost to another worker
+    engine.claim = lambda amr, sort=None, task_instance_id=None: None
+    engine.process_tasks()
+    assert not engine.work_available
+    assert not engine._has_assignable_work()
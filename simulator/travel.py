@@ -0,0 +1,215 @@
+import heapq
+import json
+import os
+import threading
+
+from assignment import move_locations
+
+INF = float('inf')
+
+# Simulated duration of an action that does not say how long it takes, and of a MOVE off the map
+ACTION_SECONDS = float(os.environ.get('SIM_ACTION_SECONDS', '5'))
+# ROTATE takes target_diff degrees at this rate (180 degrees = ACTION_SECONDS by default)
+ROTATE_DEGREES_PER_SECOND = float(os.environ.get('SIM_ROTATE_DEGREES_PER_SECOND', str(180 / ACTION_SECONDS)))
+REVERSE_SECONDS = float(os.environ.get('SIM_REVERSE_SECONDS', str(ACTION_SECONDS)))
+# JSON map of indexed locations: {"edges": [[a, b, seconds], ...], "directed": false}
+MAP_FILE = os.environ.get('SIM_MAP_FILE')
+
+
+class TravelTimes:
+    """
+    Shortest travel time in seconds between every pair of indexed
+    locations of a map, kept as a dense matrix so a lookup is two index
+    operations. The matrix is built once with a Dijkstra pass per location
+    and patched in place when an edge changes: a faster edge relaxes every
+    pair through it, a slower or removed one only re-runs the sources whose
+    shortest paths used it. Pairs off the map take ACTION_SECONDS, so
+    without a map every MOVE lasts as long as any other action.
+    """
+
+    def __init__(self, edges=(), directed=False):
+        self.directed = directed
+        self.nodes = []
+        self.index = {}
+        self.adjacency = []
+        self.matrix = []
+        self._lock = threading.Lock()
+        for a, b, seconds in edges:
+            for u, v in self._arcs(a, b):
+                self.adjacency[u][v] = float(seconds)
+        self.matrix = [self._dijkstra(source) for source in range(len(self.nodes))]
+
+    @classmethod
+    def from_file(cls, path=MAP_FILE):
+        if not path:
+            return cls()
+        with open(path) as f:
+            graph = json.load(f)
+        return cls(graph.get('edges', []), directed=graph.get('directed', False))
+
+    def seconds(self, a, b):
+        """Travel time from a to b, ACTION_SECONDS when either is unknown or b cannot be reached."""
+        i, j = self.index.get(str(a)), self.index.get(str(b))
+        if i is None or j is None:
+            return ACTION_SECONDS
+        seconds = self.matrix[i][j]
+        return seconds if seconds < INF else ACTION_SECONDS
+
+    def set_edge(self, a, b, seconds):
+        """
+        Add, change or (with seconds=None) remove the edge a-b and update the
+        matrix. Returns how many sources had to be recomputed.
+        """
+        with self._lock:
+            new = INF if seconds is None else float(seconds)
+            faster, slower = [], []
+            for u, v in self._arcs(a, b):
+                old = self.adjacency[u].get(v, INF)
+                if new == old:
+                    continue
+                if new < INF:
+                    self.adjacency[u][v] = new
+                else:
+                    self.adjacency[u].pop(v, None)
+                (faster if new < old else slower).append((u, v, old))
+            # Only sources whose shortest path to v ran over u-v can get slower
+            stale = {source for source, row in enumerate(self.matrix) for u, v, old in slower
+                     if row[u] < INF and row[u] + old <= row[v] + 1e-9}
+            for source in stale:
+                self.matrix[source] = self._dijkstra(source)
+            for u, v, old in faster:
+                self._relax(u, v, new)
+            return len(stale)
+
+    def _arcs(self, a, b):
+        u, v = self._node(a), self._node(b)
+        return [(u, v)] if self.directed else [(u, v), (v, u)]
+
+    def _node(self, location):
+        location = str(location)
+        i = self.index.get(location)
+        if i is None:
+            i = self.index[location] = len(self.nodes)
+            self.nodes.append(location)
+            self.adjacency.append({})
+            for row in self.matrix:
+                row.append(INF)
+            self.matrix.append([INF] * i + [0.0])
+        return i
+
+    def _relax(self, u, v, seconds):
+        # Every pair i, j may now be shorter going i -> u -> v -> j
+        via = self.matrix[v]
+        for row in self.matrix:
+            base = row[u] + seconds
+            if base >= INF:
+                continue
+            for j, rest in enumerate(via):
+                if base + rest < row[j]:
+                    row[j] = base + rest
+
+    def _dijkstra(self, source):
+        dist = [INF] * len(self.nodes)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, seconds in self.adjacency[u].items():
+                if d + seconds < dist[v]:
+                    dist[v] = d + seconds
+                    heapq.heappush(heap, (d + seconds, v))
+        return dist
+
+
+def _float(config, key, default):
+    try:
+        return float(config.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def action_durations(actions, start=None, travel=None):
+    """
+    Estimated seconds per action of a task run by an AMR at `start`: MOVE
+    is the travel time from the previous location, WAIT its wait_time,
+    ROTATE its target_diff at ROTATE_DEGREES_PER_SECOND, REVERSE
+    REVERSE_SECONDS and anything else ACTION_SECONDS.
+    """
+    travel = travel if travel is not None else travel_times
+    location = start
+    durations = []
+    for action in actions or []:
+        kind = action.get('type')
+        config = action.get('config') or {}
+        if kind == 'MOVE' and config.get('location') not in (None, ''):
+            durations.append(travel.seconds(location, config['location']) if location is not None
+                             else ACTION_SECONDS)
+            location = config['location']
+        elif kind == 'WAIT':
+            durations.append(_float(config, 'wait_time', ACTION_SECONDS))
+        elif kind == 'ROTATE':
+            durations.append(abs(_float(config, 'target_diff', 180)) / ROTATE_DEGREES_PER_SECOND)
+        elif kind == 'REVERSE':
+            durations.append(REVERSE_SECONDS)
+        else:
+            durations.append(ACTION_SECONDS)
+    return durations
+
+
+class Plan:
+    """
+    Duration of a task split into the part that depends on where the AMR
+    starts (reaching the first MOVE) and the part that does not, so the
+    ETA of many instances of one Task version costs one matrix lookup each.
+    """
+
+    __slots__ = ('fixed', 'first', 'destination')
+
+    def __init__(self, actions, travel):
+        locations = move_locations(actions)
+        durations = action_durations(actions, None, travel)
+        self.first = locations[0] if locations else None
+        self.destination = locations[-1] if locations else None
+        # Without a start location the first MOVE was counted as ACTION_SECONDS
+        self.fixed = sum(durations) - (ACTION_SECONDS if self.first is not None else 0.0)
+
+    def seconds(self, start, travel):
+        if self.first is None:
+            return self.fixed
+        return self.fixed + (travel.seconds(start, self.first) if start is not None else ACTION_SECONDS)
+
+
+def forecast(available, queued, travel=None):
+    """
+    Completion times of queued instances in claim order. `available` lists
+    (seconds until free, AMR name, location it will be at) per working AMR
+    and `queued` the instance documents with their actions; each instance
+    goes to the AMR that frees up first, as the engine would hand it out.
+    Plans are shared by instances of the same Task version. Returns
+    {task_instance_id: seconds from now}; with no AMR available every
+    instance gets None.
+    """
+    travel = travel if travel is not None else travel_times
+    heap = list(available)
+    heapq.heapify(heap)
+    plans = {}
+    etas = {}
+    for doc in queued:
+        if not heap:
+            etas[str(doc['_id'])] = None
+            continue
+        key = (doc.get('task_id'), doc.get('task_version')) if doc.get('task_version') is not None else doc['_id']
+        plan = plans.get(key)
+        if plan is None:
+            plan = plans[key] = Plan(doc.get('actions'), travel)
+        free_at, name, location = heap[0]
+        done = free_at + plan.seconds(location, travel)
+        etas[str(doc['_id'])] = done
+        heapq.heapreplace(heap, (done, name, plan.destination if plan.destination is not None else location))
+    return etas
+
+
+# Loaded once per process from SIM_MAP_FILE; edges are changed through set_edge()
+travel_times = TravelTimes.from_file()
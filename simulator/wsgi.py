@@ -0,0 +1,2 @@
+# Production entry point (see gunicorn.conf.py); importing app runs startup() and starts the engine.
+from app import app